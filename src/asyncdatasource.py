@@ -0,0 +1,86 @@
+'''
+Created on Oct 18, 2026
+
+Runs DataSource work for several tables
+at once from asyncio, a bounded number
+at a time.
+
+@author: Philip Deck
+'''
+import asyncio
+import functools
+import logging
+import datasource
+
+log = logging.getLogger(__name__)
+
+
+class AsyncDataSource():
+    '''Awaitable fetches and inserts over many tables of one schema.
+
+    MySQLdb blocks, so every call runs on a worker thread of the loop's
+    default executor with its own DataSource for the table. Nothing is
+    shared between calls but the connection pool, which keeps one
+    connection per concurrent call. At most concurrency calls run at
+    once, the rest wait their turn.'''
+
+    def __init__(self, db_host, db_user, db_pass, db_name, concurrency=4):
+        '''Constructor'''
+        self.db_host = db_host
+        self.db_user = db_user
+        self.db_pass = db_pass
+        self.db_name = db_name
+        self.concurrency = concurrency
+        self.semaphore = None  # Made on the loop that runs the calls, see run
+        self.semaphore_loop = None
+        pool = datasource.get_pool(db_host, db_user, db_pass, db_name)
+        pool.max_idle = max(pool.max_idle, concurrency)  # Keep every worker's connection for reuse
+
+    @classmethod
+    def from_source(cls, source, concurrency=4):
+        """Makes one with the same connection parameters as a DataSource."""
+        return cls(source.db_host, source.db_user, source.db_pass, source.db_name, concurrency)
+
+    def table(self, table_name):
+        """A DataSource of its own for one table, so no call changes another's table."""
+        return datasource.DataSource(self.db_host, self.db_user, self.db_pass, self.db_name, table_name)
+
+    async def run(self, function, *args, **kwargs):
+        """Runs a blocking call on a worker thread once one of the concurrency slots is free.
+
+        Before Python 3.10 a Semaphore belongs to the loop current when it
+        is made, so it is only made once the calls are running, and again
+        for every new loop."""
+        loop = asyncio.get_running_loop()
+        if self.semaphore_loop is not loop:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            self.semaphore_loop = loop
+        async with self.semaphore:
+            return await loop.run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+    async def get_headers(self, table_name):
+        """The column names of a table."""
+        return await self.run(self.table(table_name).get_headers)
+
+    async def get_all_records(self, table_name, progress=None, **query):
+        """Every record of a table as a list, query narrows it down like DataSource.select_statement."""
+        return await self.run(self.table(table_name).get_all_records, progress, **query)
+
+    async def create_table(self, table_name, header, types=None):
+        """Drops and creates a table."""
+        return await self.run(self.table(table_name).create_table, header, types)
+
+    async def insert_batches(self, table_name, batches, chunk_size=10000, progress=None):
+        """Inserts batches of records into a table, returns the number of rows inserted."""
+        return await self.run(self.table(table_name).insert_batches, batches, chunk_size, progress)
+
+    async def gather(self, jobs):
+        """Awaits a dict of coroutines together, returns each key's result or the exception it raised.
+
+        One table failing doesn't stop the others."""
+        keys = list(jobs)
+        results = await asyncio.gather(*jobs.values(), return_exceptions=True)
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                log.error("%s failed: %s", key, result)
+        return dict(zip(keys, results))
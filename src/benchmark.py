@@ -0,0 +1,230 @@
+'''
+Created on Oct 18, 2026
+
+Times the load, save, edit, import and export
+paths on synthetic StatCan shaped csv files.
+
+Usage:
+    python benchmark.py --sizes 10k,1m --output results.json
+    python benchmark.py --db localhost phil 1473 cst8333 BenchDataset
+    python benchmark.py --baseline results.json
+
+@author: Philip Deck
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import csvloader
+import datasource
+import filesource
+import metrics
+
+HEADER = ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+GEOS = ['Canada', 'Newfoundland and Labrador', 'Prince Edward Island', 'Nova Scotia', 'New Brunswick',
+        'Quebec', 'Ontario', 'Manitoba', 'Saskatchewan', 'Alberta', 'British Columbia']
+COMMODS = ['Meat, fish and dairy products', 'Fruits, vegetables, feeds and other food products',
+           'Beverages and tobacco products', 'Textile and leather products', 'Lumber and other wood products',
+           'Pulp and paper products', 'Energy and petroleum products', 'Chemicals and chemical products']
+SIZES = {"10k": 10000, "100k": 100000, "1m": 1000000, "10m": 10000000}
+
+
+def parse_size(size):
+    """Turns 10k, 1m or a plain number of rows into a number of rows."""
+    size = size.strip().lower()
+    return SIZES[size] if size in SIZES else int(size)
+
+
+def generate_rows(rows, seed=8333):
+    """Yields rows shaped like the StatCan sample: one series per region and commodity, month after month."""
+    rng = random.Random(seed)
+    series = len(GEOS) * len(COMMODS)
+    for i in range(rows):
+        month, serie = divmod(i, series)
+        geo, commod = divmod(serie, len(COMMODS))
+        yield [MONTHS[month % 12] + "-" + "{0:02d}".format((81 + month // 12) % 100),
+               GEOS[geo],
+               COMMODS[commod],
+               "v" + str(1574569 + serie),
+               str(geo + 1) + "." + str(commod + 1),
+               "{0:.1f}".format(rng.uniform(20, 180))]
+
+
+def generate_file(path, rows):
+    """Writes a csv file of rows synthetic rows, reusing it when it already exists."""
+    if not os.path.exists(path):
+        filesource.FileSource(path + ".tmp").save_file(generate_rows(rows), HEADER)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+class Benchmark():
+    '''Runs timed cases and collects their results.'''
+
+    def __init__(self, repeat=1):
+        '''Constructor'''
+        self.repeat = repeat  # Runs per case, the fastest is kept
+        self.results = list()
+
+    def time(self, name, rows, case, setup=None):
+        """Times case() repeat times and records the fastest run.
+
+        setup() is run untimed before every run."""
+        runs = list()
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            case()
+            runs.append(time.perf_counter() - start)
+        seconds = min(runs)
+        self.results.append({"name": name, "rows": rows, "seconds": round(seconds, 6),
+                             "rows_per_sec": round(rows / seconds) if seconds else None})
+        print("{0:<32} {1:>10} rows {2:>10.3f}s".format(name, rows, seconds), file=sys.stderr)
+
+    def skip(self, name, rows, reason):
+        """Records a case that could not run."""
+        self.results.append({"name": name, "rows": rows, "skipped": reason})
+        print("{0:<32} {1:>10} rows    skipped: {2}".format(name, rows, reason), file=sys.stderr)
+
+
+def run_file_cases(bench, path, rows, edits):
+    """Times parsing, saving and editing a csv file of rows rows."""
+    source = filesource.FileSource(path)
+    bench.time("filesource.load_data", rows, source.load_data)
+    bench.time("filesource.iter_rows", rows, lambda: sum(1 for _ in source.iter_rows()))
+
+    header, data = source.load_data()
+    out = path + ".saved.csv"
+    bench.time("filesource.save_file", rows, lambda: filesource.FileSource(out).save_file(data, header))
+    os.remove(out)
+    for extension in (".csv.gz", ".csvcol"):
+        saved = filesource.FileSource(path + extension)
+        bench.time("filesource.save_file (" + extension + ")", rows, lambda: saved.save_file(data, header))
+        bench.time("filesource.load_data (" + extension + ")", rows, saved.load_data)
+        bench.results[-1]["bytes"] = os.path.getsize(saved.file_name)
+        os.remove(saved.file_name)
+
+    loader = csvloader.CSVLoader()
+    loader.set_file(path)
+    bench.time("csvloader.load_data_from_file", rows, loader.load_data_from_file)
+    rng = random.Random(1)
+    positions = [rng.randrange(rows) for _ in range(edits)]
+
+    def insert():
+        for n in positions:
+            loader.insert_row(n, data[0])
+
+    def update():
+        for n in positions:
+            loader.update_row(n, data[1])
+
+    def delete():
+        for _ in positions:
+            loader.delete_row(rng.randrange(len(loader.data)))
+
+    bench.time("csvloader.insert_row", edits, insert, loader.load_data_from_file)
+    bench.time("csvloader.update_row", edits, update, loader.load_data_from_file)
+    bench.time("csvloader.delete_row", edits, delete, loader.load_data_from_file)
+    loader.set_file(path)
+    loader.load_data_from_file()
+
+    def drop_index():
+        loader.index = None  # Built again by the next search
+
+    bench.time("csvloader.filter_rows (build)", rows, lambda: loader.filter_rows(("GEO", "=", "Ontario")), drop_index)
+    bench.time("csvloader.filter_rows", rows, lambda: loader.filter_rows(("GEO", "=", "Quebec")))
+
+
+def run_db_cases(bench, path, rows, db):
+    """Times exporting a csv file of rows rows to a table and importing it back."""
+    try:
+        datasource.driver()
+    except ImportError as err:
+        bench.skip("datasource", rows, str(err))
+        return
+
+    loader = csvloader.CSVLoader()
+    loader.create_connection(*db)
+    loader.set_file(path)
+    loader.load_data_from_file()
+
+    bench.time("datasource.insert_batches", rows, loader.insert_records_into_table, loader.create_table)
+    loader.parallel = 4
+    bench.time("datasource.insert_partitions (4)", rows, loader.insert_records_into_table, loader.create_table)
+    loader.parallel = 1
+    bench.time("datasource.load_data_infile", rows, loader.bulk_load_into_table, loader.create_table)
+    bench.time("datasource.get_all_records", rows, loader.db_helper.get_all_records)
+    bench.time("datasource.iter_records", rows, lambda: sum(map(len, loader.db_helper.iter_records())))
+    loader.close_connections()
+
+
+def compare(results, baseline):
+    """Adds how much slower (above 1) or faster each case got since a baseline run."""
+    before = {(result["name"], result["rows"]): result.get("seconds") for result in baseline["results"]}
+    for result in results:
+        previous = before.get((result["name"], result["rows"]))
+        if previous and result.get("seconds"):
+            result["change"] = round(result["seconds"] / previous, 3)
+
+
+def version():
+    """The git commit being measured, None outside a checkout."""
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the CSV Loader on synthetic StatCan shaped data.")
+    parser.add_argument("--sizes", default="10k,1m", help="Comma separated row counts, e.g. 10k,1m,10m")
+    parser.add_argument("--folder", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_data"),
+                        help="Where the generated csv files are kept between runs")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case, the fastest is reported")
+    parser.add_argument("--edits", type=int, default=1000, help="Row edits timed per edit case")
+    parser.add_argument("--db", nargs=5, metavar=("HOST", "USER", "PASS", "SCHEMA", "TABLE"),
+                        help="A scratch MySQL table to time the database paths against, it is dropped and refilled")
+    parser.add_argument("--output", help="Write the JSON results here instead of to stdout")
+    parser.add_argument("--baseline", help="A previous JSON result to compare against")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Also report the span and counter totals, at some cost to the timings")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.folder, exist_ok=True)
+    bench = Benchmark(args.repeat)
+    totals = metrics.Totals()
+    if args.metrics:
+        metrics.add_sink(totals)
+    for rows in map(parse_size, args.sizes.split(",")):
+        path = generate_file(os.path.join(args.folder, "statcan_" + str(rows) + ".csv"), rows)
+        run_file_cases(bench, path, rows, min(args.edits, rows))
+        if args.db:
+            run_db_cases(bench, path, rows, args.db)
+        else:
+            bench.skip("datasource", rows, "no --db given")
+
+    report = {"version": version(), "python": platform.python_version(), "platform": platform.platform(),
+              "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": bench.results}
+    if args.metrics:
+        metrics.remove_sink(totals)
+        report["metrics"] = totals.snapshot()
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            compare(bench.results, json.load(file))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
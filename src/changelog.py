@@ -0,0 +1,82 @@
+'''
+Created on Oct 18, 2026
+
+Records the edits made to rows loaded
+from a table so only they get written back.
+
+@author: Philip Deck
+'''
+from collections import Counter
+
+
+class ChangeLog():
+    '''Net inserts, updates and deletes made since the data was loaded.
+
+    Tables don't need a primary key, so a row is identified by its values
+    as loaded. Edits that cancel out are dropped as they are recorded, e.g.
+    deleting a row that was inserted earlier leaves nothing to write.'''
+
+    def __init__(self):
+        '''Constructor'''
+        self.inserted = Counter()  # Rows to insert
+        self.deleted = Counter()  # Rows as loaded, to delete
+        self.updated = dict()  # Current row to the stack of rows as loaded it replaced
+
+    def __len__(self):
+        return sum(self.inserted.values()) + sum(self.deleted.values()) + sum(map(len, self.updated.values()))
+
+    def clear(self):
+        """Forgets every change, after they have been written or the data replaced."""
+        self.inserted.clear()
+        self.deleted.clear()
+        self.updated.clear()
+
+    @staticmethod
+    def decrement(counter, row):
+        """Takes one off a count, dropping it at zero."""
+        counter[row] -= 1
+        if not counter[row]:
+            del counter[row]
+
+    def take_original(self, row):
+        """Returns what a current row was when loaded, dropping its pending update."""
+        originals = self.updated.get(row)
+        if not originals:
+            return row
+        original = originals.pop()
+        if not originals:
+            del self.updated[row]
+        return original
+
+    def record_insert(self, line):
+        """Records a new row."""
+        row = tuple(line)
+        if self.deleted[row]:
+            self.decrement(self.deleted, row)  # Putting back a deleted row
+        else:
+            self.inserted[row] += 1
+
+    def record_delete(self, line):
+        """Records a removed row."""
+        row = tuple(line)
+        if self.inserted[row]:
+            self.decrement(self.inserted, row)  # Never reached the table
+        else:
+            self.deleted[self.take_original(row)] += 1
+
+    def record_update(self, old_line, new_line):
+        """Records a row being replaced by new values."""
+        old, new = tuple(old_line), tuple(new_line)
+        if old == new:
+            return
+        if self.inserted[old]:
+            self.decrement(self.inserted, old)
+            self.inserted[new] += 1
+            return
+        original = self.take_original(old)
+        if original != new:  # Unless the row was edited back to how it was loaded
+            self.updated.setdefault(new, list()).append(original)
+
+    def updates(self):
+        """Returns (row as loaded, current row) pairs."""
+        return [(original, row) for row, originals in self.updated.items() for original in originals]
@@ -0,0 +1,113 @@
+'''
+Created on Oct 18, 2026
+
+Keeps how far a resumable database export
+got in a small JSON file, so a rerun carries
+on from the last committed row.
+
+@author: Philip Deck
+'''
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "export_checkpoint.json")
+
+
+class Checkpoint():
+    '''How many rows of one source an export committed to one table.
+
+    Before each chunk is committed it is recorded as pending along with
+    the row count the table will have once it lands. If the export dies
+    between the commit and the next save, counting the table's rows
+    tells whether the pending chunk made it, so a rerun neither skips
+    nor repeats it. Every save is flushed to disk before it replaces the
+    previous one.'''
+
+    def __init__(self, file_name, source, target):
+        '''Constructor'''
+        self.file_name = file_name
+        self.source = json.loads(json.dumps(source))  # Describes the rows being exported, as they read back
+        self.target = json.loads(json.dumps(target))  # Describes the table, a checkpoint of another export is ignored
+        self.rows = 0  # Source rows committed so far
+        self.table_rows = None  # Rows in the table after the last commit, None until counted
+        self.pending = None  # Rows in the chunk being committed
+        self.load()
+
+    def load(self):
+        """Reads the checkpoint file, starting over when it is missing or for another export."""
+        try:
+            with open(self.file_name, encoding='utf-8') as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as err:
+            log.warning("Could not read the checkpoint, starting over: %s", err)
+            return
+        if state.get("source") != self.source or state.get("target") != self.target:
+            log.warning("The checkpoint in %s is for another export, starting over.", self.file_name)
+            return
+        self.rows = state["rows"]
+        self.table_rows = state["table_rows"]
+        self.pending = state["pending"]
+
+    def save(self):
+        """Writes the checkpoint, durably, replacing the previous one in one step."""
+        state = {"source": self.source, "target": self.target, "rows": self.rows,
+                 "table_rows": self.table_rows, "pending": self.pending}
+        with open(self.file_name + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump(state, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.file_name + ".tmp", self.file_name)
+
+    def started(self):
+        """Whether an earlier run already committed rows, the table must then be kept."""
+        return self.rows > 0 or self.pending is not None
+
+    def begin(self, rows):
+        """Records a chunk of rows as about to be committed."""
+        self.pending = rows
+        self.save()
+
+    def expected(self):
+        """The table's row count once the pending chunk is committed."""
+        return self.table_rows + (self.pending or 0)
+
+    def commit(self):
+        """Records the pending chunk as committed."""
+        self.rows += self.pending
+        self.table_rows += self.pending
+        self.pending = None
+        self.save()
+
+    def abandon(self):
+        """Records the pending chunk as not committed."""
+        self.pending = None
+        self.save()
+
+    def settle(self, table_rows):
+        """Finds out from the table's row count whether the pending chunk was committed.
+
+        Returns True when it was. Raises ValueError when the count matches
+        neither, something else wrote to the table and resuming could
+        duplicate or skip rows."""
+        if self.pending is not None and table_rows == self.expected():
+            self.commit()
+            return True
+        if table_rows == self.table_rows:
+            if self.pending is not None:
+                self.abandon()
+            return False
+        raise ValueError("The table has " + str(table_rows) + " rows but the checkpoint expected "
+                         + str(self.table_rows) + (" or " + str(self.expected()) if self.pending else "")
+                         + ", another session changed it. Remove " + self.file_name + " to start over.")
+
+    def clear(self):
+        """Removes the checkpoint once the export is done."""
+        try:
+            os.remove(self.file_name)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,219 @@
+'''
+Created on Oct 18, 2026
+
+Command line interface to the CSV Loader for
+headless servers and cron, nothing here needs
+Tk or a display.
+
+Usage:
+    python cli.py csv2db data.csv --host localhost --user phil --schema cst8333 --table Dataset --create-table
+    python cli.py csv2db big.csv --user phil --schema cst8333 --table Dataset --stream --checkpoint big.json
+    python cli.py db2csv out.csv.gz --host localhost --user phil --schema cst8333 --table Dataset --stream
+    python cli.py csv2csv data.csv data.csvcol --progress
+
+The password is read from MYSQL_PWD, or asked for when not given.
+
+@author: Philip Deck
+'''
+import argparse
+import getpass
+import logging
+import os
+import sys
+import time
+import csvloader
+import datasource
+import fileformat
+import filesource
+import metrics
+
+log = logging.getLogger(__name__)
+
+
+class Progress():
+    '''Keeps the latest row count and shows it on stderr when asked to.'''
+
+    def __init__(self, show=False):
+        '''Constructor'''
+        self.show = show
+        self.rows = 0
+        self.shown = 0.0  # When the count was last written, it is written at most 10 times a second
+
+    def __call__(self, rows):
+        self.rows = rows
+        if self.show and time.time() - self.shown >= 0.1:
+            self.shown = time.time()
+            sys.stderr.write("\r{0} rows".format(rows))
+            sys.stderr.flush()
+
+    def done(self):
+        """Ends the progress line."""
+        if self.show:
+            sys.stderr.write("\r{0} rows\n".format(self.rows))
+
+
+def add_db_arguments(parser):
+    """Adds the connection arguments of a MySQL table."""
+    parser.add_argument("--host", default="localhost", help="MySQL host")
+    parser.add_argument("--user", required=True, help="MySQL user")
+    parser.add_argument("--password", help="MySQL password, MYSQL_PWD or a prompt when left out")
+    parser.add_argument("--schema", required=True, help="MySQL schema")
+    parser.add_argument("--table", required=True, help="MySQL table")
+
+
+def add_common_arguments(parser):
+    """Adds the options every command takes."""
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream rows in batches instead of loading them all into memory first")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per batch read, written or inserted")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes parsing a plain csv file")
+    parser.add_argument("--progress", action="store_true", help="Show the rows moved so far on stderr")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log what is being done on stderr")
+    parser.add_argument("--metrics", action="store_true", help="Also log the timing spans and counters")
+
+
+def build_parser():
+    """The argument parser with one sub-command per kind of copy."""
+    parser = argparse.ArgumentParser(description="Copies rows between csv files and MySQL tables.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    csv2db = commands.add_parser("csv2db", help="Load a csv file into a table")
+    csv2db.add_argument("source", help="csv file, compressed or columnar files are read by extension")
+    add_db_arguments(csv2db)
+    csv2db.add_argument("--create-table", action="store_true", help="Drop and create the table with inferred types")
+    csv2db.add_argument("--parallel", type=int, default=1, help="Connections inserting at once")
+    csv2db.add_argument("--bulk", action="store_true", help="Send the file with LOAD DATA LOCAL INFILE")
+    csv2db.add_argument("--checkpoint", help="Commit batch by batch recording progress in this file,"
+                        " rerunning the same command resumes after the last committed row")
+    csv2db.add_argument("--retries", type=int, default=5, help="Retries of a batch after a transient error"
+                        " with --checkpoint")
+    csv2db.add_argument("--backoff", type=float, default=1.0, help="Seconds before the first retry, doubled after"
+                        " every failure")
+    add_common_arguments(csv2db)
+
+    db2csv = commands.add_parser("db2csv", help="Save a table to a csv file")
+    db2csv.add_argument("target", help="Output file, .csv.gz, .csv.zst and .csvcol pick the format")
+    add_db_arguments(db2csv)
+    db2csv.add_argument("--columns", help="Comma separated columns to save, all by default")
+    db2csv.add_argument("--where", nargs=3, action="append", default=list(), metavar=("COLUMN", "OP", "VALUE"),
+                        help="Only rows where COLUMN OP VALUE holds, OP one of: " + ", ".join(datasource.FILTER_OPERATORS))
+    db2csv.add_argument("--order-by", help="Comma separated columns to sort by, a leading - sorts descending")
+    db2csv.add_argument("--limit", type=int, help="Most rows to save")
+    db2csv.add_argument("--format", choices=fileformat.FORMATS, help="Output format, by extension by default")
+    add_common_arguments(db2csv)
+
+    csv2csv = commands.add_parser("csv2csv", help="Rewrite a csv file, for example into another format")
+    csv2csv.add_argument("source", help="csv file, compressed or columnar files are read by extension")
+    csv2csv.add_argument("target", help="Output file, .csv.gz, .csv.zst and .csvcol pick the format")
+    csv2csv.add_argument("--format", choices=fileformat.FORMATS, help="Output format, by extension by default")
+    add_common_arguments(csv2csv)
+    return parser
+
+
+def connect(loader, args):
+    """Points the loader at the table given on the command line."""
+    password = args.password if args.password is not None else os.environ.get("MYSQL_PWD")
+    if password is None:
+        password = getpass.getpass("Password for " + args.user + "@" + args.host + ": ")
+    loader.create_connection(args.host, args.user, password, args.schema, args.table)
+
+
+def query_of(args):
+    """The columns, filters, order and limit of a db2csv, as load_data_from_db takes them."""
+    query = dict()
+    if args.columns:
+        query["columns"] = [name.strip() for name in args.columns.split(",") if name.strip()]
+    if args.where:
+        query["filters"] = [(column, op, value.split(",") if op == "in" else value) for column, op, value in args.where]
+    if args.order_by:
+        query["order_by"] = [(name.strip()[1:], "desc") if name.strip().startswith("-") else name.strip()
+                             for name in args.order_by.split(",") if name.strip()]
+    if args.limit is not None:
+        query["limit"] = args.limit
+    return query
+
+
+def open_source(loader, path):
+    """Points the loader at a file, which has to exist."""
+    if not os.path.isfile(path):
+        raise FileNotFoundError("No such file: " + path)
+    loader.set_file(path)
+
+
+def csv_to_db(loader, args, progress):
+    """Loads a csv file into a table, returns the number of rows sent."""
+    open_source(loader, args.source)
+    connect(loader, args)
+    loader.parallel = args.parallel
+    if args.stream:
+        loader.stream_data_from_file()
+    else:
+        loader.load_data_from_file(progress=progress)
+    loader.checkpoint = args.checkpoint
+    if args.create_table:
+        if loader.resuming():
+            log.warning("Resuming from %s, keeping the table.", args.checkpoint)
+        else:
+            loader.create_table()
+    if args.bulk:
+        return loader.bulk_load_into_table()
+    if args.checkpoint:
+        return loader.export_resumable(args.checkpoint, args.retries, args.backoff, progress)
+    result = loader.insert_records_into_table(progress)
+    if isinstance(result, dict):  # The partitioned insert's report
+        if result["failed"] or result["in_doubt"] or not result["consistent"]:
+            log.warning("Partitioned insert: %s", result)
+        return result["inserted"]
+    return result
+
+
+def db_to_csv(loader, args, progress):
+    """Saves a table to a file, returns the number of rows saved."""
+    connect(loader, args)
+    loader.load_data_from_db(args.stream, None if args.stream else progress, **query_of(args))
+    loader.save_file(args.target, progress, args.format)
+    return progress.rows
+
+
+def csv_to_csv(loader, args, progress):
+    """Rewrites a file, returns the number of rows saved."""
+    open_source(loader, args.source)
+    if args.stream:
+        return loader.transfer(loader.file_helper, filesource.FileSource(args.target, file_format=args.format),
+                               progress=progress)
+    loader.load_data_from_file(progress=progress)
+    loader.save_file(args.target, progress, args.format)
+    return progress.rows
+
+
+COMMANDS = {"csv2db": csv_to_db, "db2csv": db_to_csv, "csv2csv": csv_to_csv}
+
+
+def main(argv=None):
+    """Runs one command, returns the exit status."""
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.metrics:
+        metrics.add_sink(metrics.LoggingSink(level=logging.WARNING))
+
+    loader = csvloader.CSVLoader()
+    loader.batch_size = args.batch_size
+    loader.processes = args.processes
+    progress = Progress(args.progress)
+    pre = time.time()
+    try:
+        rows = COMMANDS[args.command](loader, args, progress)
+    except (OSError, ValueError, ImportError, datasource.MySQLError) as err:
+        progress.done()
+        print("csvloader: error:", err, file=sys.stderr)
+        return 1
+    finally:
+        loader.close_connections()
+    progress.done()
+    print("{0}: {1} rows in {2:.2f} seconds.".format(args.command, rows, time.time() - pre))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+'''
+Created on Oct 18, 2026
+
+Compact column by column storage for
+the rows held by the CSVLoader.
+
+@author: Philip Deck
+'''
+from array import array
+
+
+class PlainColumn():
+    '''Stores a column as a Python list, for values that can't be encoded.'''
+
+    def __init__(self, values=()):
+        '''Constructor'''
+        self.values = list(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def __delitem__(self, i):
+        del self.values[i]
+
+    def insert(self, i, value):
+        """Inserts value at i, returns False when the column can't hold it."""
+        self.values.insert(i, value)
+        return True
+
+    def set(self, i, value):
+        """Replaces the value at i, returns False when the column can't hold it."""
+        self.values[i] = value
+        return True
+
+    def extend(self, values):
+        """Appends values, returns False when the column can't hold all of them."""
+        self.values.extend(values)
+        return True
+
+
+class NumberColumn():
+    '''Stores a column of integer or decimal strings as a typed array.'''
+
+    def __init__(self, typecode):
+        '''Constructor'''
+        self.values = array(typecode)  # 'q' for integers, 'd' for floats
+        self.cast = int if typecode == 'q' else float
+
+    def encode(self, value):
+        """Returns the number for value, None unless it gives back the same string."""
+        if type(value) is not str:
+            return None
+        try:
+            number = self.cast(value)
+        except (ValueError, OverflowError):
+            return None
+        return number if repr(number) == value else None
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return map(repr, self.values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(map(repr, self.values[i]))
+        return repr(self.values[i])
+
+    def __delitem__(self, i):
+        del self.values[i]
+
+    def insert(self, i, value):
+        """Inserts value at i, returns False when the column can't hold it."""
+        number = self.encode(value)
+        if number is None:
+            return False
+        try:
+            self.values.insert(i, number)
+        except OverflowError:
+            return False
+        return True
+
+    def set(self, i, value):
+        """Replaces the value at i, returns False when the column can't hold it."""
+        number = self.encode(value)
+        if number is None:
+            return False
+        try:
+            self.values[i] = number
+        except OverflowError:
+            return False
+        return True
+
+    def extend(self, values):
+        """Appends values, returns False when the column can't hold all of them."""
+        numbers = list(map(self.encode, values))
+        if None in numbers:
+            return False
+        try:
+            self.values.extend(numbers)
+        except OverflowError:
+            return False
+        return True
+
+
+class DictColumn():
+    '''Stores a column of repeating values as codes into a list of its distinct values.'''
+
+    def __init__(self):
+        '''Constructor'''
+        self.codes = array('I')
+        self.distinct = list()  # Distinct values, indexed by code
+        self.lookup = dict()  # (type, value) to code, the type keeps 1, 1.0 and True apart
+
+    def encode(self, value):
+        """Returns the code for value, None when the value can't be hashed."""
+        key = (type(value), value)
+        try:
+            return self.lookup[key]
+        except KeyError:
+            self.lookup[key] = len(self.distinct)
+            self.distinct.append(value)
+            return self.lookup[key]
+        except TypeError:
+            return None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return map(self.distinct.__getitem__, self.codes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(map(self.distinct.__getitem__, self.codes[i]))
+        return self.distinct[self.codes[i]]
+
+    def __delitem__(self, i):
+        del self.codes[i]
+
+    def insert(self, i, value):
+        """Inserts value at i, returns False when the column can't hold it."""
+        code = self.encode(value)
+        if code is None:
+            return False
+        self.codes.insert(i, code)
+        return True
+
+    def set(self, i, value):
+        """Replaces the value at i, returns False when the column can't hold it."""
+        code = self.encode(value)
+        if code is None:
+            return False
+        self.codes[i] = code
+        return True
+
+    def extend(self, values):
+        """Appends values, returns False when the column can't hold all of them."""
+        codes = list(map(self.encode, values))
+        if None in codes:
+            return False
+        self.codes.extend(codes)
+        return True
+
+
+def choose_column(values):
+    """Returns the most compact empty column that can hold values."""
+    for typecode in ('q', 'd'):
+        column = NumberColumn(typecode)
+        if values and None not in map(column.encode, values):
+            return column
+    try:
+        if len(set(values)) <= len(values) // 2:  # Only worth it when values repeat
+            return DictColumn()
+    except TypeError:
+        pass
+    return PlainColumn()
+
+
+class ColumnStore():
+    '''A list of rows kept as one compact column per field.
+
+    Integer and float strings that convert back exactly are kept in typed
+    arrays, repeating values are dictionary encoded and anything else
+    stays in a list. Rows are handed out as new lists, so edits have to
+    go through insert, __setitem__ and __delitem__.'''
+
+    def __init__(self, width):
+        '''Constructor'''
+        self.width = width  # Number of fields in every row
+        self.columns = None  # Chosen from the first rows added
+        self.length = 0
+
+    def check(self, row):
+        """Raises ValueError if the row doesn't have one value per column."""
+        if len(row) != self.width:
+            raise ValueError("Row has " + str(len(row)) + " fields, expected " + str(self.width) + ".")
+
+    def widen(self, j):
+        """Replaces column j with one that can hold any value."""
+        values = list(self.columns[j])
+        column = DictColumn()
+        if not column.extend(values):
+            column = PlainColumn(values)
+        self.columns[j] = column
+
+    def extend(self, rows):
+        """Appends rows, choosing the column types from the first ones."""
+        rows = list(rows)
+        if not rows:
+            return
+        for row in rows:
+            self.check(row)
+        fields = [[row[j] for row in rows] for j in range(self.width)]
+        if self.columns is None:
+            self.columns = [choose_column(values) for values in fields]
+        for j, values in enumerate(fields):
+            if not self.columns[j].extend(values):
+                self.widen(j)
+                if not self.columns[j].extend(values):
+                    self.columns[j] = PlainColumn(list(self.columns[j]) + values)
+        self.length += len(rows)
+
+    def append(self, row):
+        """Appends a single row."""
+        self.insert(self.length, row)
+
+    def insert(self, n, row):
+        """Inserts a row before index n, like list.insert."""
+        self.check(row)
+        if self.columns is None:
+            self.extend([row])
+            return
+        n = max(0, min(n if n >= 0 else self.length + n, self.length))
+        for j, value in enumerate(row):
+            if not self.columns[j].insert(n, value):
+                self.widen(j)
+                if not self.columns[j].insert(n, value):
+                    self.columns[j] = PlainColumn(self.columns[j])
+                    self.columns[j].insert(n, value)
+        self.length += 1
+
+    def __setitem__(self, n, row):
+        """Replaces the row at index n."""
+        self.check(row)
+        n = range(self.length)[n]  # Raises IndexError like a list
+        for j, value in enumerate(row):
+            if not self.columns[j].set(n, value):
+                self.widen(j)
+                if not self.columns[j].set(n, value):
+                    self.columns[j] = PlainColumn(self.columns[j])
+                    self.columns[j].set(n, value)
+
+    def __delitem__(self, n):
+        n = range(self.length)[n]  # Raises IndexError like a list
+        for column in self.columns:
+            del column[n]
+        self.length -= 1
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            if not self.columns:
+                return list()
+            return [list(row) for row in zip(*(column[n] for column in self.columns))]
+        n = range(self.length)[n]  # Raises IndexError like a list
+        return [column[n] for column in self.columns]
+
+    def __iter__(self):
+        if not self.columns:
+            return iter(())
+        return map(list, zip(*self.columns))
@@ -6,8 +6,30 @@ delegates task to separate modules.
 
 @author: Philip Deck
 '''
+import logging
+import os
+import re
+import threading
+from itertools import chain, islice
+import changelog
+import checkpoint
+import columnstore
 import datasource
 import filesource
+import indexedreader
+import metrics
+import pipeline
+import rowlist
+import searchindex
+import typeinfer
+
+log = logging.getLogger(__name__)
+
+
+def table_name_for(file_path):
+    """Names a table after a file, without its extensions and with anything but letters, digits and _ replaced."""
+    name = os.path.basename(file_path).split(".")[0]
+    return re.sub(r"\W", "_", name) or "imported"
 
 
 # Handles file operations
@@ -16,10 +38,22 @@ class CSVLoader():
 
     def __init__(self):
         '''Constructor'''
-        self.data = list()
+        self.data = rowlist.RowList()
         self.header = list()
         self.db_helper = None
         self.file_helper = None
+        self.stream_source = None  # The FileSource or DataSource rows are streamed from instead of held in data
+        self.batch_size = 10000  # Rows per batch when streaming
+        self.source_file = None  # The csv file the data matches, None once edited or replaced
+        self.columnar = False  # Keep loaded data in a compact ColumnStore instead of a list of lists
+        self.processes = 1  # Worker processes used to parse csv files
+        self.parallel = 1  # Connections inserting at once when exporting to a table
+        self.checkpoint = None  # Checkpoint file that makes exports to a table resumable, None exports in one go
+        self.snapshots = False  # Save a snapshot of every import so reopening it unchanged skips parsing
+        self.changes = changelog.ChangeLog()  # Edits since the data was loaded
+        self.sync_target = None  # The DataSource the data was loaded from, changes can be synced back to it
+        self.index = None  # Search indexes over data, started over whenever data is replaced
+        self.query = dict()  # The columns, filters, order and limit the table was loaded with
 
     def create_connection(self,
                          db_host: str,
@@ -27,11 +61,7 @@ class CSVLoader():
                          db_pass: str,
                          db_name: str,
                          table_name: str):
-        print("Saving database parameters...")
-        print("\tHost:", db_host)
-        print("\tUser:", db_user)
-        print("\tPass:", db_pass)
-        print("\tDatabase:", db_name)
+        log.info("Saving database parameters for %s@%s/%s.", db_user, db_host, db_name)  # Never the password
         self.db_helper = datasource.DataSource(db_host, db_user, db_pass, db_name, table_name)
         
     def test_connection(self):
@@ -39,57 +69,473 @@ class CSVLoader():
 
     def set_file(self, file_name: str):
         """Changes the file name."""
-        self.file_helper = filesource.FileSource(file_name)  # just makes a new file source object.
+        self.file_helper = filesource.FileSource(file_name, self.processes)  # just makes a new file source object.
 
     def set_table(self,
                  table_name):
         """Changes the table to be used in the database."""
         self.db_helper.set_table(table_name)
 
-    def load_data_from_file(self):
-        """Loads data and header from file."""
+    def load_data_from_file(self, lazy=False, progress=None):
+        """Loads data and header from file.
+        
+        When lazy is set the rows are streamed from the file in batches
+        whenever they are needed, and data becomes a read-only IndexedReader
+        that pages rows in from a row offset index. Compressed and columnar
+        files can't be paged like that so they are always loaded. progress
+        is called with the number of rows read so far."""
         try:
-            print("Getting data from file...")
-            self.header, self.data = self.file_helper.load_data()
+            log.info("Getting data from %s", self.file_helper.file_name)
+            if lazy and not self.file_helper.is_plain():
+                log.info("Only plain csv files can be opened read-only, loading %s instead.", self.file_helper.file_format)
+                lazy = False
+            if lazy:
+                reader = indexedreader.IndexedReader(self.file_helper.file_name)
+                self.header = reader.header
+                self.data = reader
+                self.stream_source = self.file_helper
+            elif progress or self.columnar:
+                rows = self.file_helper.iter_rows(self.batch_size)
+                header = next(rows, list())
+                self.data = self.collect(rows, len(header), progress)
+                self.header = header
+                self.stream_source = None
+            else:
+                header, data = self.file_helper.load_data()
+                self.header, self.data = header, rowlist.RowList(data)
+                self.stream_source = None
+            self.source_file = self.file_helper.file_name
+            self.sync_target = None
+            self.changes.clear()
 
         except AttributeError:
-            print("Set file name before loading data.")
+            log.error("Set file name before loading data.")
+
+    def stream_data_from_file(self):
+        """Reads only the header of the file, the rows are streamed from it in batches whenever they are needed.
+
+        Unlike a lazy load_data_from_file nothing is indexed, so the file
+        is read once per pass and the data can't be paged or edited."""
+        log.info("Streaming data from %s", self.file_helper.file_name)
+        rows = filesource.FileSource(self.file_helper.file_name, file_format=self.file_helper.file_format).iter_rows(1)
+        try:
+            self.header = next(rows, list())
+        finally:
+            rows.close()
+        self.data = rowlist.RowList()
+        self.stream_source = self.file_helper
+        self.source_file = self.file_helper.file_name
+        self.sync_target = None
+        self.changes.clear()
 
-    def save_file(self, file_path=""):
-        """Saves a csv format file with all data in the list to a file."""
-        print("Saving data to", file_path)
-        file_helper = filesource.FileSource(file_path)
-        file_helper.save_file(self.data, self.header)
+    def iter_data(self, batch_size=None, start=0):
+        """Yields the data in lists of at most batch_size rows, from row start on.
+
+        Rows held in memory or paged in by an IndexedReader are sliced from
+        start, streamed rows before start have to be read and skipped."""
+        batch_size = batch_size or self.batch_size
+        if self.stream_source is None or (start and isinstance(self.data, indexedreader.IndexedReader)):
+            for i in range(start, len(self.data), batch_size):
+                yield self.data[i:i + batch_size]
+            return
+        if isinstance(self.stream_source, filesource.FileSource):
+            rows = self.stream_source.iter_rows(batch_size)
+            next(rows, None)  # Skip the header
+        else:
+            rows = self.stream_source.iter_records(batch_size, **self.query)
+        if start:
+            rows = pipeline.chunked(islice(chain.from_iterable(rows), start, None), batch_size)
+        yield from rows
+
+    def save_file(self, file_path="", progress=None, file_format=None):
+        """Saves a csv format file with all data in the list to a file.
+
+        file_format is one of fileformat.FORMATS, by default it is picked
+        from the extension: .csv.gz and .csv.zst are compressed csv, .csvcol
+        the columnar format. The rows are written to a temporary file that
+        only replaces file_path once every row is in, so a save that is
+        cancelled or fails leaves any earlier file as it was."""
+        log.info("Saving data to %s", file_path)
+        if (isinstance(self.stream_source, filesource.FileSource)
+                and os.path.abspath(file_path) == os.path.abspath(self.stream_source.file_name)):
+            log.error("Cannot save a streamed file over itself.")
+            return
+        file_format = filesource.FileSource(file_path, file_format=file_format).file_format
+        file_helper = filesource.FileSource(file_path + ".tmp", file_format=file_format)
+        try:
+            file_helper.save_file(chain.from_iterable(pipeline.counted(self.iter_data(), progress)), self.header)
+            os.replace(file_helper.file_name, file_path)
+        except BaseException:
+            if os.path.exists(file_helper.file_name):
+                os.remove(file_helper.file_name)  # Half a file is worse than none
+            raise
     
-    def load_data_from_db(self):
-        """Load data from the database."""
-        print("Getting data from database...")
-        self.data = self.db_helper.get_all_records()
-        print("Getting headers from database...")
-        self.header = self.db_helper.get_headers()
+    def load_data_from_db(self, lazy=False, progress=None, **query):
+        """Load data from the database.
+        
+        When lazy is set only the header is read, the rows are streamed
+        from the table in batches whenever they are needed. query takes
+        columns, filters, order_by, limit and offset, compiled into the
+        select by DataSource.select_statement so only the rows and
+        columns asked for leave the server."""
+        log.info("Getting headers from database...")
+        self.db_helper.select_statement(**query)  # Raises on unknown columns before anything changes
+        header = list(query.get("columns") or self.db_helper.get_headers())
+        log.info("Getting data from %s.", self.db_helper.table_name)
+        if lazy:
+            self.data = rowlist.RowList()
+            self.stream_source = self.db_helper.copy()  # Keeps streaming this table after set_table
+        elif self.columnar:
+            self.data = self.collect(self.db_helper.iter_records(self.batch_size, **query), len(header), progress)
+            self.stream_source = None
+        else:
+            self.data = rowlist.RowList(self.db_helper.get_all_records(progress, **query))
+            self.stream_source = None
+        self.header = header
+        self.query = query
+        self.source_file = None
+        # Rows missing columns can't be matched back to the table
+        self.sync_target = None if lazy or query.get("columns") else self.db_helper
+        self.changes.clear()
+
+    def recent_source(self, kind):
+        """Describes the current "file" or "table" for the recent imports, without the password."""
+        if kind == "file":
+            return {"type": "file", "file_name": os.path.abspath(self.file_helper.file_name)}
+        return {"type": "table", "db_host": self.db_helper.db_host, "db_user": self.db_helper.db_user,
+                "db_name": self.db_helper.db_name, "table_name": self.db_helper.table_name}
+
+    def recent_version(self, kind):
+        """What the current file or table looks like now, a snapshot is valid while this matches."""
+        if kind == "file":
+            stat = os.stat(self.file_helper.file_name)
+            return [stat.st_size, stat.st_mtime_ns]
+        return self.db_helper.checksum_table()
+
+    def import_recent(self, recent, kind, progress=None):
+        """Loads the current "file" or "table", from its snapshot in recent when still valid.
+
+        Otherwise the source is read as usual and, with snapshots set, a
+        new snapshot is saved. Without snapshots the source is only listed
+        in recent, checking a table's version is a scan of the whole table.
+        Returns True when the snapshot was used."""
+        source = self.recent_source(kind)
+        if not self.snapshots:
+            self.load_recent(kind, progress)
+            recent.save_snapshot(source, None, self.header, self.data)
+            return False
+        version = self.recent_version(kind)  # Before reading, a change while reading invalidates it
+        snapshot = recent.load_snapshot(source, version)
+        if snapshot is None:
+            self.load_recent(kind, progress)
+            recent.save_snapshot(source, version, self.header, self.data)
+            return False
+
+        log.info("Loading the snapshot of %s", source)
+        if progress:
+            progress(len(snapshot[1]))  # A cancelled job stops here, before anything changed
+        self.header, self.data = snapshot
+        self.stream_source = None
+        self.source_file = self.file_helper.file_name if kind == "file" else None
+        self.sync_target = self.db_helper if kind == "table" else None
+        self.changes.clear()
+        return True
+
+    def load_recent(self, kind, progress=None):
+        """Reads the current "file" or "table" into data."""
+        if kind == "file":
+            self.load_data_from_file(progress=progress)
+        else:
+            self.load_data_from_db(progress=progress)
+
+    def collect(self, batches, width, progress=None):
+        """Gathers batches of rows into a RowList, or a ColumnStore when columnar is set."""
+        data = columnstore.ColumnStore(width) if self.columnar else rowlist.RowList()
+        for batch in pipeline.counted(batches, progress):
+            try:
+                data.extend(batch)
+            except ValueError as err:  # Rows of different lengths don't fit in columns
+                log.warning("%s Keeping the rows as lists.", err)
+                data = rowlist.RowList(data)
+                data.extend(batch)
+        return data
     
+    def is_editable(self):
+        """Streamed data is read-only, only data held in memory can be edited."""
+        return self.stream_source is None
+
     def insert_row(self, n, line):
         """Inserts a row into the data."""
         self.data.insert(n, line)
+        self.changes.record_insert(line)
+        self.source_file = None
+        if self.live_index():
+            self.index.insert(n, line)
         
     def delete_row(self, n):
+        row = self.data[n]
+        self.changes.record_delete(row)
         del self.data[n]
+        self.source_file = None
+        if self.live_index():
+            self.index.delete(n, row)
+
+    def update_row(self, n, line):
+        """Replaces the row at index n."""
+        row = self.data[n]
+        self.changes.record_update(row, line)
+        self.data[n] = line
+        self.source_file = None
+        if self.live_index():
+            self.index.update(n, row, line)
+
+    def live_index(self):
+        """Whether the search indexes were built over the current data."""
+        return self.index is not None and self.index.data is self.data
+
+    def filter_rows(self, *conditions):
+        """Returns the rows matching every (column name, op, value) condition, in data order.
+
+        op is one of searchindex.OPERATORS. A column's index is built the
+        first time it is searched, later searches and row edits only touch
+        the rows involved."""
+        if not self.live_index():
+            self.index = searchindex.RowIndex(self.data)
+        columns = list()
+        for column, op, value in conditions:
+            if column not in self.header:
+                raise ValueError("Unknown column " + repr(column))
+            if op not in searchindex.OPERATORS:
+                raise ValueError("Unknown operator " + repr(op))
+            columns.append((self.header.index(column), op, value))
+        with metrics.span("loader.filter", conditions=len(columns)) as span:
+            found = self.index.search(columns)
+            span.add(rows=len(found))
+        return found
+
+    def sync_to_database(self, progress=None):
+        """Writes only the edits made since loading back to the table they came from.
+        
+        progress is called with the rows affected so far. Returns the
+        number of rows affected."""
+        if self.sync_target is None:
+            log.error("Load data from a table before syncing changes.")
+            return 0
+        log.info("Syncing %d changes...", len(self.changes))
+        affected = self.sync_target.apply_changes(self.changes, progress)
+        self.changes.clear()
+        return affected
     
-    def insert_records_into_table(self):
-        print("Inserting records")
-        self.db_helper.insert_records_into_table(self.data)
+    def insert_records_into_table(self, progress=None):
+        """Inserts the data into the current table.
         
+        With a checkpoint file set the export is resumable, see
+        export_resumable. Otherwise with parallel above 1 the rows are
+        inserted in partitions over that many connections and the
+        partitioned insert's consistency report is returned, otherwise the
+        number of rows inserted."""
+        log.info("Inserting records into %s", self.db_helper.table_name)
+        if (isinstance(self.stream_source, datasource.DataSource)
+                and self.stream_source.same_table(self.db_helper)):
+            log.error("Cannot insert a streamed table into itself.")
+            return 0
+        if self.checkpoint:
+            return self.export_resumable(self.checkpoint, progress=progress)
+        if self.parallel > 1:
+            return self.db_helper.insert_partitions(self.iter_data(), self.parallel, self.batch_size * 5,
+                                                    self.batch_size, progress=progress)
+        return self.db_helper.insert_batches(self.iter_data(), self.batch_size, progress)
+        
+    def export_resumable(self, checkpoint_file, retries=5, backoff=1.0, progress=None):
+        """Inserts the data into the current table one committed batch at a time, resuming a cut off run.
+
+        How many rows were committed is kept in checkpoint_file. Running
+        it again with the same data and table carries on after the last
+        committed row, without inserting any row twice. Transient
+        OperationalErrors are retried up to retries times per batch with
+        exponential backoff from backoff seconds. The checkpoint is removed
+        once every row is in. Returns the number of rows exported over
+        every run."""
+        point = checkpoint.Checkpoint(checkpoint_file, self.export_source(), self.recent_source("table"))
+        self.db_helper.resume(point)
+        if point.rows:
+            log.info("Resuming the export after %d rows committed by an earlier run.", point.rows)
+        self.db_helper.insert_checkpointed(self.iter_data(start=point.rows), point, self.batch_size,
+                                           retries, backoff, progress)
+        point.clear()
+        return point.rows
+
+    def resuming(self):
+        """Whether a resumable export of this data to the current table was cut off, the table must then be kept."""
+        return bool(self.checkpoint) and checkpoint.Checkpoint(self.checkpoint, self.export_source(),
+                                                               self.recent_source("table")).started()
+
+    def export_source(self):
+        """Describes the rows an export sends, a checkpoint is only resumed for the same rows."""
+        if self.source_file:
+            stat = os.stat(self.source_file)
+            return {"file_name": os.path.abspath(self.source_file), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if isinstance(self.stream_source, datasource.DataSource):
+            return {"table": self.stream_source.db_host + "/" + self.stream_source.db_name + "."
+                    + self.stream_source.table_name, "query": repr(sorted(self.query.items()))}
+        return {"header": self.header, "rows": len(self.data)}
+
+    def bulk_load_into_table(self):
+        """Loads the data into the table with LOAD DATA LOCAL INFILE.
+        
+        The imported file is sent as is when the data has not been edited
+        and it is plain csv, otherwise the data is first written to a
+        temporary csv file."""
+        if self.source_file and filesource.FileSource(self.source_file).is_plain():
+            log.info("Bulk loading %s", self.source_file)
+            return self.db_helper.load_data_infile(self.source_file, self.header,
+                                                   filesource.FileSource(self.source_file).get_line_terminator())
+
+        import tempfile  # Only needed for edited data
+        spool, spool_path = tempfile.mkstemp(suffix=".csv")
+        os.close(spool)
+        try:
+            log.info("Spooling data to %s", spool_path)
+            spool_file = filesource.FileSource(spool_path)
+            spool_file.save_file(chain.from_iterable(self.iter_data()), self.header)
+            # Written in text mode, so lines end in \r\n on Windows
+            return self.db_helper.load_data_infile(spool_path, self.header, spool_file.get_line_terminator())
+        finally:
+            os.remove(spool_path)
+
+    def transfer(self, source, sink, create_table=False, progress=None):
+        """Streams every row from source into sink without going through data.
+        
+        Either end can be a FileSource or a DataSource. Batches are read on a
+        background thread into a bounded queue, so reading waits whenever
+        writing falls behind. Returns the number of rows moved."""
+        if isinstance(source, filesource.FileSource):
+            batches = source.iter_rows(self.batch_size)
+            header = next(batches, list())
+        else:
+            header = source.get_headers()
+            batches = source.iter_records(self.batch_size)
+
+        log.info("Transferring rows...")
+        if isinstance(sink, filesource.FileSource):
+            if isinstance(source, filesource.FileSource) and os.path.abspath(source.file_name) == os.path.abspath(sink.file_name):
+                log.error("Cannot transfer a file into itself.")
+                return 0
+            count = 0
+
+            def report(rows):
+                nonlocal count
+                count = rows
+                if progress:
+                    progress(rows)
+
+            sink.save_file(chain.from_iterable(pipeline.counted(pipeline.prefetch(batches), report)), header)
+        else:
+            if isinstance(source, datasource.DataSource) and source.same_table(sink):
+                log.error("Cannot transfer a table into itself.")
+                return 0
+            if create_table:
+                first = next(batches, list())
+                second = next(batches, None)  # None when the first batch holds every row
+                sink.create_table(header, typeinfer.infer_types(first, len(header), complete=second is None))
+                batches = chain([first], [second] if second else [], batches)
+            count = sink.insert_batches(batches, self.batch_size, progress)
+        log.info("Transferred %d rows.", count)
+        return count
+
+    def transfer_file_to_table(self, file_path, create_table=False, progress=None):
+        """Copies a csv file straight into the current table."""
+        return self.transfer(filesource.FileSource(file_path, self.processes), self.db_helper, create_table, progress)
+
+    def transfer_table_to_file(self, file_path, progress=None):
+        """Copies the current table straight into a csv file."""
+        return self.transfer(self.db_helper, filesource.FileSource(file_path), progress=progress)
+
+    def import_tables(self, table_names, folder, extension=".csv", concurrency=4, progress=None):
+        """Copies several tables of the current schema into files in folder at once.
+
+        Each file is named after its table, extension picks its format.
+        At most concurrency tables are copied at a time, each over its
+        own connection. progress is called with the rows copied so far
+        over every table. Returns each table's row count, or the
+        exception that stopped it, whose file is removed."""
+        import asyncio  # Slow to import and only needed here
+        import asyncdatasource
+        source = asyncdatasource.AsyncDataSource.from_source(self.db_helper, concurrency)
+        report = self.combined_progress(progress)
+        paths = {name: os.path.join(folder, name + extension) for name in table_names}
+        jobs = {name: source.run(self.transfer, source.table(name), filesource.FileSource(path), False, report(name))
+                for name, path in paths.items()}
+        results = asyncio.run(source.gather(jobs))
+        for name, result in results.items():
+            if isinstance(result, Exception) and os.path.exists(paths[name]):
+                os.remove(paths[name])  # Half a table is worse than none
+        return results
+
+    def export_files(self, file_paths, create_table=False, concurrency=4, progress=None):
+        """Copies several files into tables of the current schema at once.
+
+        file_paths is a list of files, each going into the table named
+        after it, or a dict of file to table name. Works like
+        import_tables otherwise, returns each file's row count or the
+        exception that stopped it."""
+        import asyncio
+        import asyncdatasource
+        targets = file_paths if isinstance(file_paths, dict) else {path: table_name_for(path) for path in file_paths}
+        source = asyncdatasource.AsyncDataSource.from_source(self.db_helper, concurrency)
+        report = self.combined_progress(progress)
+        jobs = {path: source.run(self.transfer, filesource.FileSource(path, self.processes), source.table(table),
+                                 create_table, report(path))
+                for path, table in targets.items()}
+        return asyncio.run(source.gather(jobs))
+
+    @staticmethod
+    def combined_progress(progress):
+        """Returns a maker of per-job progress callbacks that report the total of every job to progress."""
+        counts = dict()
+        lock = threading.Lock()
+
+        def report(key):
+            def update(rows):
+                with lock:
+                    counts[key] = rows
+                    total = sum(counts.values())
+                if progress:
+                    progress(total)
+            return update
+        return report
+
     def delete_all_records(self):
-        print("Deleting all records")
+        log.info("Deleting all records")
         self.db_helper.delete_all_records()
         
+    def infer_types(self, sample_size=10000):
+        """Infers a MySQL type per column of the data.
+        
+        Rows held in memory are all read, the types have to fit every one
+        of them. Streamed rows are sampled from the start, which only
+        picks each column's kind, see typeinfer.ColumnStats.sql_type."""
+        width = len(self.header)
+        if self.stream_source is not None:
+            sample = list(islice(chain.from_iterable(self.iter_data()), sample_size + 1))
+            return typeinfer.infer_types(sample, width, complete=len(sample) <= sample_size)
+        return typeinfer.infer_types(self.data, width)
+
     def create_table(self):
-        print("Creating new table.")
-        self.db_helper.create_table(self.header)
+        log.info("Creating new table.")
+        self.db_helper.create_table(self.header, self.infer_types())
         
     def is_connected(self):
         return self.db_helper.test_connection()
 
+    def close_connections(self):
+        """Closes the pooled database connections."""
+        datasource.close_pools()
+
     def clear_data(self):
-        print("Clearing data...")
-        self.data = list()
\ No newline at end of file
+        log.debug("Clearing data...")
+        self.data = rowlist.RowList()
+        self.stream_source = None
+        self.source_file = None
+        self.sync_target = None
+        self.changes.clear()
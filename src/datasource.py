@@ -5,9 +5,159 @@ Handles database connection and SQL queries
 
 @author: Philip Deck
 '''
+import logging
 import time
-from MySQLdb import connect  # https://github.com/PyMySQL/mysqlclient-python
-from _mysql_exceptions import OperationalError
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import chain, islice
+import metrics
+import pipeline
+import typeinfer
+
+log = logging.getLogger(__name__)
+
+FILTER_OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "starts with", "in", "is null", "is not null")
+NO_LIMIT = 18446744073709551615  # MySQL has no offset without a limit, this is its documented "all rows"
+
+_pools = dict()  # Connection pools shared by every DataSource, keyed by their parameters
+_pools_lock = threading.Lock()
+_driver = None  # The MySQLdb module once the first connection is made
+
+
+class MySQLError(Exception):
+    '''Stands in for the driver's base error until it is loaded, nothing raises it before then.'''
+
+
+class OperationalError(MySQLError):
+    '''Stands in for the driver's OperationalError until it is loaded, nothing raises it before then.'''
+
+
+def driver():
+    """Imports the MySQL connector the first time it is needed.
+
+    Loading it is slow and it may not even be installed when only csv
+    files are edited, so nothing is imported until a connection opens.
+    MySQLError and OperationalError are then rebound to the driver's own."""
+    global _driver, MySQLError, OperationalError
+    if _driver is None:
+        import MySQLdb  # https://github.com/PyMySQL/mysqlclient-python
+        import MySQLdb.cursors
+        MySQLError = MySQLdb.MySQLError
+        OperationalError = MySQLdb.OperationalError
+        _driver = MySQLdb
+    return _driver
+
+
+def get_pool(db_host, db_user, db_pass, db_name, local_infile=False):
+    """Returns the shared connection pool for these parameters."""
+    key = (db_host, db_user, db_pass, db_name, local_infile)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_host, db_user, db_pass, db_name, local_infile=int(local_infile))
+        return _pools[key]
+
+
+def quote_name(name):
+    """Quotes a column name for a statement run with parameters."""
+    return "`" + name.replace("`", "``").replace("%", "%%") + "`"
+
+
+def escape_like(value):
+    """Escapes the LIKE wildcards in a value so it only matches itself."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def close_pools():
+    """Closes every idle pooled connection."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+class ConnectionPool():
+    '''Keeps database connections open so they can be reused between queries.'''
+
+    def __init__(self,
+                 db_host,
+                 db_user,
+                 db_pass,
+                 db_name,
+                 max_idle=4,
+                 ping_after=30,
+                 **options):
+        '''Constructor'''
+        self.connect_args = dict(host=db_host, user=db_user, passwd=db_pass, db=db_name, **options)
+        self.max_idle = max_idle  # Most connections kept open while unused
+        self.ping_after = ping_after  # Seconds a connection can idle before it is health-checked
+        self.idle = list()  # (connection, time released) pairs
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Returns a live connection, reusing an idle one when possible."""
+        while True:
+            with self.lock:
+                db, released = self.idle.pop() if self.idle else (None, None)
+            if db is None:
+                log.debug("Opening a database session to %s.", self.connect_args["host"])
+                with metrics.span("db.open", host=self.connect_args["host"]):
+                    db = driver().connect(**self.connect_args)
+                metrics.count("db.connections")
+                return db
+            if time.time() - released < self.ping_after or self.is_alive(db):
+                return db
+            self.discard(db)
+
+    def release(self, db):
+        """Gives a connection back to the pool, closing it when the pool is full."""
+        if db is None or not db.open:
+            return
+        try:
+            db.rollback()  # Never hand over a connection with an open transaction
+        except OperationalError:
+            self.discard(db)
+            return
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append((db, time.time()))
+                return
+        self.discard(db)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that acquires a connection and releases it after."""
+        db = self.acquire()
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    @staticmethod
+    def is_alive(db):
+        """Health-checks a connection with a ping."""
+        try:
+            db.ping()
+            return True
+        except OperationalError:
+            return False
+
+    @staticmethod
+    def discard(db):
+        """Closes a connection that won't be reused."""
+        try:
+            log.debug("Closing database session.")
+            db.close()
+        except OperationalError:
+            pass
+
+    def close(self):
+        """Closes every idle connection."""
+        with self.lock:
+            idle, self.idle = self.idle, list()
+        for db, _ in idle:
+            self.discard(db)
 
 
 # Class that handles the database methods and connections
@@ -27,39 +177,351 @@ class DataSource():
         self.db_name = db_name  # Databse schema name
         self.table_name = table_name  # Database table name
         self.db = None
+        self.sessions = 0  # Nested open_database calls sharing self.db
+        self.pool = get_pool(db_host, db_user, db_pass, db_name)
+
+    def __enter__(self):
+        """Holds one session open so every call inside the block reuses it."""
+        self.open_database()
+        return self
+
+    def __exit__(self, *exc):
+        self.close_database()
 
     # Insert records from csv file
     def insert_records_into_table(self,
-                   data_list: list):
-        """Inserts a list of records into the database."""
+                   data_list: list,
+                   chunk_size: int = 10000,
+                   progress=None):
+        """Inserts a list of records into the database, returns the number of rows inserted."""
+        return self.insert_batches([data_list], chunk_size, progress)
+
+    def insert_batches(self,
+                       batches,
+                       chunk_size: int = 10000,
+                       progress=None):
+        """Inserts batches of records, committing every chunk_size rows.
+        
+        The next chunk is read from the batches on a background thread while
+        the current one is being inserted. progress is called with the total
+        number of committed rows after every chunk. Returns the number of
+        rows inserted."""
 
         try:
-            insert_statement = self.get_insert_statement(self.get_headers())
-            
             self.open_database()
+
+            insert_statement = self.get_insert_statement(self.get_headers())
+            # Values are converted for the column types once, on the prefetch thread
+            rows = typeinfer.convert_rows(chain.from_iterable(batches), typeinfer.converters(self.get_column_types()))
             
             with self.db.cursor() as cursor:
 
-                print("Starting database insert.")
+                log.info("Starting database insert.")
                 pre = time.time()
-                cursor.executemany(insert_statement, data_list)
-                self.db.commit()
+                count = 0
+                for chunk in pipeline.prefetch(pipeline.chunked(rows, chunk_size)):
+                    chunk_pre = time.time()
+                    with metrics.span("db.insert", table=self.table_name, rows=len(chunk)):
+                        cursor.executemany(insert_statement, chunk)
+                    with metrics.span("db.commit", table=self.table_name):
+                        self.db.commit()
+                    metrics.count("db.rows_inserted", len(chunk))
+                    count += len(chunk)
+                    elapsed = max(time.time() - chunk_pre, 1e-6)
+                    log.debug("Committed %d rows (%.0f rows/sec), %d total.", len(chunk), len(chunk) / elapsed, count)
+                    if progress:
+                        progress(count)
                 post = time.time()
                 
-                print("Finished database insert. Took {0:.2f} seconds.".format(post - pre))
-                print("Inserted", len(data_list), "rows into", self.table_name, "in schema", self.db_name + ".")
+                log.info("Inserted %d rows into %s in schema %s. Took %.2f seconds.",
+                         count, self.table_name, self.db_name, post - pre)
+                return count
         finally:
-            cursor.close()
             self.close_database()
     
+    def insert_partitions(self,
+                          batches,
+                          parallel: int = 4,
+                          partition_size: int = 50000,
+                          chunk_size: int = 10000,
+                          retries: int = 3,
+                          progress=None):
+        """Inserts batches of records over several connections at once.
+        
+        The rows are cut into partitions of partition_size rows, each one
+        inserted by one of parallel threads on its own pooled connection and
+        committed as one transaction. A partition that fails with an
+        OperationalError (lost connection, deadlock, lock wait timeout)
+        while inserting was rolled back, so it is retried from its first row
+        up to retries times. One whose commit fails isn't retried, the
+        server may have committed it before the connection went, it is
+        listed as in doubt instead. progress is called with the number of
+        committed rows after every partition. Returns a consistency report
+        comparing the rows sent to how much the table grew, which counts
+        as consistent when the rows of the partitions in doubt account for
+        the difference."""
+        header = self.get_headers()
+        insert_statement = self.get_insert_statement(header)
+        rows = typeinfer.convert_rows(chain.from_iterable(batches), typeinfer.converters(self.get_column_types()))
+        partitions = enumerate(pipeline.chunked(rows, partition_size))
+        self.pool.max_idle = max(self.pool.max_idle, parallel)  # Keep every worker's connection for reuse
+
+        report = {"partitions": 0, "sent": 0, "inserted": 0, "retries": 0, "failed": list(), "in_doubt": list(),
+                  "rows_before": self.count_records()}
+        doubtful = 0  # Rows of the partitions in doubt
+        log.info("Starting partitioned insert over %d connections.", parallel)
+        pre = time.time()
+        with ThreadPoolExecutor(parallel) as pool:
+            pending = deque()
+
+            def submit(count):
+                for number, partition in islice(partitions, count):
+                    pending.append((number, len(partition),
+                                    pool.submit(self.insert_partition, insert_statement, partition, chunk_size, retries)))
+
+            submit(parallel * 2)  # Bounded, the rest is read as partitions finish
+            try:
+                while pending:
+                    number, size, future = pending.popleft()
+                    report["partitions"] += 1
+                    report["sent"] += size
+                    try:
+                        attempts = future.result()
+                        if attempts is None:
+                            report["in_doubt"].append(number)
+                            doubtful += size
+                        else:
+                            report["inserted"] += size
+                            report["retries"] += attempts - 1
+                    except Exception as err:
+                        log.error("Partition %d failed: %s", number, err)
+                        report["failed"].append(number)
+                    submit(1)
+                    if progress:
+                        progress(report["inserted"])
+            finally:
+                for _, _, future in pending:
+                    future.cancel()  # Cancelled by progress, finish what is running only
+
+        report["rows_after"] = self.count_records()
+        report["consistent"] = 0 <= report["rows_after"] - report["rows_before"] - report["inserted"] <= doubtful
+        log.info("Inserted %d of %d rows in %d partitions with %d retries, table went from %d to %d rows."
+                 " Took %.2f seconds.", report["inserted"], report["sent"], report["partitions"], report["retries"],
+                 report["rows_before"], report["rows_after"], time.time() - pre)
+        if report["failed"]:
+            log.error("Failed partitions: %s", report["failed"])
+        if report["in_doubt"]:
+            log.error("Partitions that may or may not have been committed: %s", report["in_doubt"])
+        if not report["consistent"]:
+            log.warning("The table changed by a different number of rows than were inserted,"
+                        " another session may be writing to it.")
+        return report
+
+    def insert_partition(self, insert_statement, rows, chunk_size, retries):
+        """Inserts one partition as one transaction on its own pooled connection.
+        
+        Runs on a worker thread. Returns the number of attempts it took, or
+        None when the commit failed and it isn't known whether it went through."""
+        for attempt in range(1, retries + 2):
+            committing = False
+            try:
+                with self.pool.connection() as db:  # Rolled back by the pool if it fails
+                    with db.cursor() as cursor:
+                        for chunk in pipeline.chunked(rows, chunk_size):
+                            with metrics.span("db.insert", table=self.table_name, rows=len(chunk)):
+                                cursor.executemany(insert_statement, chunk)
+                    committing = True
+                    with metrics.span("db.commit", table=self.table_name):
+                        db.commit()
+                metrics.count("db.rows_inserted", len(rows))
+                return attempt
+            except OperationalError as err:
+                if committing:
+                    log.warning("Not retrying a partition of %d rows whose commit failed: %s", len(rows), err)
+                    return None  # Inserting it again could duplicate every row
+                if attempt > retries:
+                    raise
+                log.warning("Retrying a partition of %d rows after: %s", len(rows), err)
+                metrics.count("db.retries")
+                time.sleep(min(0.5 * 2 ** attempt, 10))
+
+    def insert_checkpointed(self,
+                            batches,
+                            checkpoint,
+                            chunk_size: int = 10000,
+                            retries: int = 5,
+                            backoff: float = 1.0,
+                            progress=None):
+        """Inserts batches of records in committed chunks, recording each one in a Checkpoint.
+
+        batches must start right after the checkpoint's committed rows,
+        see resume. A chunk failing with an OperationalError is retried up
+        to retries times, waiting backoff seconds and twice as long after
+        every failure. Before a retry the table's rows are counted, which
+        tells whether the failed commit went through after all, so a chunk
+        is never inserted twice. progress is called with the rows committed
+        over every run. Returns the number of rows committed by this run."""
+        insert_statement = self.get_insert_statement(self.get_headers())
+        rows = typeinfer.convert_rows(chain.from_iterable(batches), typeinfer.converters(self.get_column_types()))
+        log.info("Starting checkpointed insert after %d committed rows.", checkpoint.rows)
+        count = 0
+        for chunk in pipeline.prefetch(pipeline.chunked(rows, chunk_size)):
+            for attempt in range(retries + 1):
+                try:
+                    if attempt and checkpoint.settle(self.count_committed()):
+                        break  # The commit that failed had gone through
+                    checkpoint.begin(len(chunk))
+                    with self.pool.connection() as db:  # Rolled back by the pool if it fails
+                        with db.cursor() as cursor:
+                            with metrics.span("db.insert", table=self.table_name, rows=len(chunk)):
+                                cursor.executemany(insert_statement, chunk)
+                        with metrics.span("db.commit", table=self.table_name):
+                            db.commit()
+                    checkpoint.commit()
+                    break
+                except OperationalError as err:
+                    if attempt == retries:
+                        raise
+                    log.warning("Retrying a chunk of %d rows after: %s", len(chunk), err)
+                    metrics.count("db.retries")
+                    time.sleep(min(backoff * 2 ** attempt, 60))
+            count += len(chunk)
+            metrics.count("db.rows_inserted", len(chunk))
+            if progress:
+                progress(checkpoint.rows)
+        log.info("Committed %d rows into %s, %d over every run.", count, self.table_name, checkpoint.rows)
+        return count
+
+    def resume(self, checkpoint):
+        """Gets a Checkpoint ready for another run of insert_checkpointed.
+
+        A new checkpoint starts from the table's current row count. One
+        left by an earlier run is checked against it, settling whether
+        its last chunk was committed."""
+        table_rows = self.count_committed()
+        if checkpoint.table_rows is None:
+            checkpoint.table_rows = table_rows
+            checkpoint.save()
+        else:
+            checkpoint.settle(table_rows)
+
+    def count_committed(self):
+        """Counts the table's rows on a pooled connection, raising OperationalError when it can't."""
+        with self.pool.connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM " + self.table_name)
+                return cursor.fetchone()[0]
+
+    def count_records(self):
+        """Returns the number of rows in the table."""
+        try:
+            self.open_database()
+            with self.db.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM " + self.table_name)
+                return cursor.fetchone()[0]
+        finally:
+            self.close_database()
+
+    def load_data_infile(self,
+                         file_name: str,
+                         header: list,
+                         line_terminator: str = "\n"):
+        """Bulk loads a csv file through LOAD DATA LOCAL INFILE.
+        
+        The first line of the file is the header and is skipped. Empty fields
+        in columns that aren't text are loaded as NULL. Returns the number
+        of rows loaded."""
+        fields = list()
+        assignments = list()
+        for i, (column, convert) in enumerate(zip(header, typeinfer.converters(self.get_column_types()))):
+            if convert is None:
+                fields.append(column)
+            else:
+                fields.append("@field" + str(i))
+                assignments.append(column + " = NULLIF(@field" + str(i) + ", '')")
+        with get_pool(self.db_host, self.db_user, self.db_pass, self.db_name, True).connection() as db:
+            with db.cursor() as cursor:
+                load_statement = ("LOAD DATA LOCAL INFILE %s INTO TABLE " + self.table_name
+                                  + " CHARACTER SET utf8mb4"
+                                  + " FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY ''"
+                                  + " LINES TERMINATED BY %s IGNORE 1 LINES"
+                                  + " (" + ",".join(fields) + ")"
+                                  + (" SET " + ", ".join(assignments) if assignments else "") + ";")
+                log.info("Starting bulk load of %s", file_name)
+                pre = time.time()
+                with metrics.span("db.load_infile", table=self.table_name) as span:
+                    cursor.execute(load_statement, (file_name, line_terminator))
+                    db.commit()
+                    span.add(rows=cursor.rowcount)
+                metrics.count("db.rows_inserted", cursor.rowcount)
+                post = time.time()
+                log.info("Loaded %d rows into %s in schema %s. Took %.2f seconds.",
+                         cursor.rowcount, self.table_name, self.db_name, post - pre)
+                return cursor.rowcount
+
+    def apply_changes(self, changes, progress=None):
+        """Writes a ChangeLog to the table inside one transaction.
+        
+        Rows are matched on every column with the null-safe <=>, and each
+        recorded change touches at most one matching row. progress is called
+        with the rows affected so far after the deletes, updates and inserts,
+        an exception it raises rolls everything back. Returns the number of
+        rows affected."""
+        try:
+            self.open_database()
+            header = self.get_headers()
+            convert = typeinfer.converters(self.get_column_types())
+            where = " WHERE " + " AND ".join(column + " <=> %s" for column in header)
+
+            deleted = list(changes.deleted.items())
+            deletes = [list(row) + [count] for row, (_, count) in
+                       zip(typeinfer.convert_rows([row for row, _ in deleted], convert), deleted)]
+            updated = changes.updates()
+            updates = [list(new) + list(old) for old, new in
+                       zip(typeinfer.convert_rows([old for old, _ in updated], convert),
+                           typeinfer.convert_rows([new for _, new in updated], convert))]
+            inserts = [list(row) for row in typeinfer.convert_rows(
+                [row for row, count in changes.inserted.items() for _ in range(count)], convert)]
+
+            with self.db.cursor() as cursor:
+                log.info("Applying %d changes to %s.", len(changes), self.table_name)
+                affected = 0
+                try:
+                    with metrics.span("db.apply_changes", table=self.table_name, changes=len(changes)):
+                        if deletes:
+                            affected += cursor.executemany("DELETE FROM " + self.table_name + where + " LIMIT %s", deletes) or 0
+                            if progress:
+                                progress(affected)
+                        if updates:
+                            affected += cursor.executemany("UPDATE " + self.table_name + " SET "
+                                                           + ", ".join(column + " = %s" for column in header)
+                                                           + where + " LIMIT 1", updates) or 0
+                            if progress:
+                                progress(affected)
+                        if inserts:
+                            cursor.executemany(self.get_insert_statement(header), inserts)
+                            affected += len(inserts)
+                            if progress:
+                                progress(affected)
+                        self.db.commit()
+                except Exception:
+                    self.db.rollback()
+                    raise
+                if affected < len(changes):
+                    log.warning("%d changed rows were no longer in the table.", len(changes) - affected)
+                log.info("Affected %d rows in %s in schema %s.", affected, self.table_name, self.db_name)
+                return affected
+        finally:
+            self.close_database()
+
     def get_insert_statement(self, header):
         """Builds an insert statement based on the header."""
             # Statement Builder
             # Builds a create table statement based on the names and number of headers
         insert_statement = "INSERT INTO " + self.table_name + "("
         values = ") VALUES ("
-        for header in self.get_headers():
-            insert_statement += header + ","
+        for column in header:
+            insert_statement += column + ","
             values += "%s,"
         values = values[0:-1] + ")"
         insert_statement = insert_statement[0:-1]
@@ -69,20 +531,93 @@ class DataSource():
         # """INSERT INTO tablename (%s,%s,%s) VALUES (value1,value2,value3);"""
         return insert_statement
             
-    def get_all_records(self):
-        """Gets all records of the database as a list."""
+    def get_all_records(self, progress=None, **query):
+        """Gets all records of the database as a list.
+        
+        progress is called with the number of records fetched so far,
+        query narrows the select down like for select_statement."""
+        data = list()
+        for batch in pipeline.counted(self.iter_records(**query), progress):
+            data.extend(list(line) for line in batch)  # Converting every line from a tuple to a list.
+        log.info("Got all %d records.", len(data))
+        return data
+
+    def iter_records(self, batch_size=10000, **query):
+        """Yields the records as lists of at most batch_size tuples.
+        
+        Uses an unbuffered server-side cursor so only one batch is held
+        in memory at a time. query narrows the select down like for
+        select_statement."""
+        statement, params = self.select_statement(**query)  # Before the cursor, it needs the connection to itself
         try:
             self.open_database()  # Open the database.
-            with self.db.cursor() as cursor:  # Create a cursor.
-                cursor.execute('select * from ' + self.table_name + ';')  # Select all from the table.
-                data = list(cursor.fetchall())  # Execute the query.
-                print("Got all", len(data), "records.")
-                for i, line in enumerate(data):
-                    data[i] = list(line)  # Converting every line from a tuple to a list.
-                return data
+            # A server-side cursor, closing it discards any unread rows
+            with self.db.cursor(driver().cursors.SSCursor) as cursor:
+                cursor.execute(statement, params)  # Select from the table.
+                while True:
+                    with metrics.span("db.fetch", table=self.table_name):
+                        batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    metrics.count("db.rows_fetched", len(batch))
+                    yield batch
         finally:
-            cursor.close()  # Close the cursor.
             self.close_database()  # Close the database.
+
+    def select_statement(self, columns=None, filters=(), order_by=(), limit=None, offset=None):
+        """Compiles a select of the table into SQL and its parameters, so the server does the filtering.
+        
+        columns picks the columns returned, in order. filters are (column,
+        op, value) conditions that must all hold, op being one of
+        FILTER_OPERATORS ("in" takes a list, the null tests ignore value).
+        order_by holds column names or (column, "desc") pairs. Column names
+        can't be parameters so they are checked against the table, values
+        always are parameters."""
+        headers = self.get_headers() if columns or filters or order_by else list()
+
+        def column(name):
+            if name not in headers:
+                raise ValueError("Unknown column " + repr(name) + " in " + self.table_name)
+            return quote_name(name)
+
+        statement = "select " + (", ".join(column(name) for name in columns) if columns else "*")
+        statement += " from " + self.table_name
+        params = list()
+        conditions = list()
+        for name, op, value in filters:
+            if op in ("is null", "is not null"):
+                conditions.append(column(name) + " " + op)
+            elif op == "in":
+                values = list(value)
+                conditions.append(column(name) + " in (" + ", ".join(["%s"] * len(values)) + ")" if values else "false")
+                params.extend(values)
+            elif op == "starts with":
+                conditions.append(column(name) + " like %s")
+                params.append(escape_like(str(value)) + "%")
+            elif op in FILTER_OPERATORS:
+                conditions.append(column(name) + (" <> " if op == "!=" else " " + op + " ") + "%s")
+                params.append(value)
+            else:
+                raise ValueError("Unknown operator " + repr(op))
+        if conditions:
+            statement += " where " + " and ".join(conditions)
+
+        if order_by:
+            order = list()
+            for item in order_by:
+                name, direction = (item, "asc") if isinstance(item, str) else item
+                if direction.lower() not in ("asc", "desc"):
+                    raise ValueError("Unknown order " + repr(direction))
+                order.append(column(name) + " " + direction.lower())
+            statement += " order by " + ", ".join(order)
+
+        if limit is not None or offset:
+            statement += " limit %s"
+            params.append(NO_LIMIT if limit is None else int(limit))
+            if offset:
+                statement += " offset %s"
+                params.append(int(offset))
+        return statement + ";", params
             
     def get_headers(self):
         """Returns a list of headers from the database."""
@@ -95,7 +630,6 @@ class DataSource():
                     headers.append(header[0])
                 return headers
         finally:
-            cursor.close()
             self.close_database()
                     
     def delete_all_records(self):
@@ -103,54 +637,107 @@ class DataSource():
         try:
             self.open_database()
             with self.db.cursor() as cursor:
-                print("\tClearing rows from", self.table_name, "in", self.db_name + ".")
+                log.info("Clearing rows from %s in %s.", self.table_name, self.db_name)
                 cursor.execute("TRUNCATE TABLE " + self.table_name)
         except AttributeError:
-            print("Cursor is None. Database must not have been initialized")
+            log.error("Cursor is None. Database must not have been initialized")
         finally:
             self.close_database()
     
+    def same_table(self, other):
+        """Whether another DataSource works on the same table as this one."""
+        return ((self.db_host, self.db_name, self.table_name)
+                == (other.db_host, other.db_name, other.table_name))
+
+    def checksum_table(self):
+        """Returns the table's CHECKSUM TABLE value, None when the server can't give one.
+
+        Computed by the server without sending any rows, so it is a cheap
+        way to tell whether the table changed since it was last read."""
+        try:
+            self.open_database()
+            with self.db.cursor() as cursor:
+                cursor.execute("CHECKSUM TABLE " + self.table_name)
+                line = cursor.fetchone()
+                return line[1] if line else None
+        finally:
+            self.close_database()
+
+    def copy(self):
+        """A DataSource of its own on the same table, set_table on either one leaves the other alone."""
+        return DataSource(self.db_host, self.db_user, self.db_pass, self.db_name, self.table_name)
+
     def set_table(self,
                  table_name: str):
         """Changes the working table"""
         if table_name:
             self.table_name = table_name
             
+    def get_column_types(self):
+        """Returns the information_schema data type of every column, in order."""
+        try:
+            self.open_database()
+            with self.db.cursor() as cursor:
+                cursor.execute('select column_name, data_type from information_schema.columns where table_name = "' + self.table_name + '" and table_schema = "' + self.db_name + '" order by ordinal_position;')
+                return [line[1] for line in cursor.fetchall()]
+        finally:
+            self.close_database()
+
     def create_table(self,
-                    header):
+                    header,
+                    types=None):
+        """Drops and creates the table, every column is VARCHAR(255) unless types are given."""
         if not header:
             return
         try:
             self.open_database()
             with self.db.cursor() as cursor:
                 create_table_statement = "CREATE TABLE " + self.table_name + "("
-                for column in header:
-                    create_table_statement += column + " VARCHAR(255),"
+                for i, column in enumerate(header):
+                    create_table_statement += column + " " + (types[i] if types else "VARCHAR(255)") + ","
                 create_table_statement = create_table_statement[0:-1] + ");"
-                print("Dropping " + self.table_name)
+                log.info("Dropping %s", self.table_name)
                 cursor.execute("DROP TABLE IF EXISTS " + self.table_name)
-                print("Creating " + self.table_name)
+                log.info("Creating %s", self.table_name)
                 cursor.execute(create_table_statement)
                 cursor.close()
         finally:
             self.close_database()
 
     def open_database(self):  # Opens a connection.
-        """Opens a database with the parameters passed."""
+        """Takes a pooled connection with the parameters passed.
+        
+        Nested calls share the connection until the outermost close. The
+        OperationalError of a connection that can't be made is raised."""
         try:
-            print("\t>>Opening a database session...")
-            self.db = connect(host=self.db_host, user=self.db_user, passwd=self.db_pass, db=self.db_name)  # Connect to the database.
-        except OperationalError:
-            print("Wrong database credentials. Closing connection.")
+            if self.db is None:
+                self.db = self.pool.acquire()  # Connect to the database.
+            self.sessions += 1
+        except OperationalError as err:
+            log.error("Could not connect to %s: %s", self.db_host, err)
+            raise
     
     def close_database(self):  # Closes a connection.
-        """Close the current database."""
+        """Gives the current connection back to the pool."""
         if self.db is not None and self.db.open:
-            print("\t>>Closing database session.")
-            self.db.close()  # Close the database.
+            self.sessions -= 1
+            if self.sessions == 0:
+                self.pool.release(self.db)  # Return the connection for reuse.
+                self.db = None
         else:
-            print("Database was not initialized.")
+            log.debug("Database was not initialized.")
+            self.db = None
+            self.sessions = 0
     
+    @contextmanager
+    def session(self):
+        """Context manager yielding the current pooled connection."""
+        self.open_database()
+        try:
+            yield self.db
+        finally:
+            self.close_database()
+
     def test_connection(self):
         """A simple test connection method."""
         connected = False
@@ -159,10 +746,10 @@ class DataSource():
             with self.db.cursor() as cursor:
                 cursor.execute('select * from ' + self.table_name + ' limit 1;')
                 cursor.close()
-            print("Connection successful.")
+            log.info("Connection successful.")
             connected = True
         except Exception as err:
-            print(err)
+            log.error("Connection failed: %s", err)
         finally:
             self.close_database()
             return connected
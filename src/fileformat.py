@@ -0,0 +1,225 @@
+'''
+Created on Oct 18, 2026
+
+The file formats rows can be saved in besides plain
+csv: gzip or zstd compressed csv, and a columnar
+binary format with typed columns and row groups.
+
+@author: Philip Deck
+'''
+import gzip
+import io
+import json
+import struct
+import sys
+import zlib
+from array import array
+import pipeline
+
+FORMATS = ("csv", "csv.gz", "csv.zst", "columnar")
+EXTENSIONS = ((".csv.gz", "csv.gz"), (".gz", "csv.gz"), (".csv.zst", "csv.zst"), (".zst", "csv.zst"),
+              (".csvcol", "columnar"))
+
+COLUMNAR_MAGIC = b'CSVCOL1\n'
+ROW_GROUP_SIZE = 65536  # Rows per row group, the reader hands out one group at a time
+LENGTH = struct.Struct('<I')
+COLUMN = struct.Struct('<cI')  # Column kind and compressed payload size
+
+_zstandard = False  # Not looked for yet
+
+
+def zstd():
+    """The zstandard module, None when it isn't installed.
+
+    Only looked for the first time a .zst file is used, it is slow to import."""
+    global _zstandard
+    if _zstandard is False:
+        try:
+            import zstandard  # https://github.com/indygreg/python-zstandard, only needed for .zst files
+        except ImportError:
+            zstandard = None
+        _zstandard = zstandard
+    return _zstandard
+
+
+def format_of(file_name):
+    """Picks the format from the file's extension, plain csv when it isn't one of ours."""
+    lower = file_name.lower()
+    for extension, file_format in EXTENSIONS:
+        if lower.endswith(extension):
+            return file_format
+    return "csv"
+
+
+def check_format(file_format):
+    """Raises ValueError for an unknown format, or zstd without the zstandard package."""
+    if file_format not in FORMATS:
+        raise ValueError("Unknown file format " + repr(file_format) + ", expected one of " + ", ".join(FORMATS))
+    if file_format == "csv.zst" and zstd() is None:
+        raise ValueError("Reading and writing .zst files needs the zstandard package: pip install zstandard")
+
+
+def open_text(file_name, mode, file_format):
+    """Opens a csv file as text, compressing or decompressing it as a stream.
+
+    mode is "r"/"rt" or "w"."""
+    check_format(file_format)
+    binary = 'w' if 'w' in mode else 'r'
+    if file_format == "csv":
+        return open(file_name, 'w' if binary == 'w' else 'rt', encoding='utf-8')
+    if file_format == "csv.gz":
+        return gzip.open(file_name, binary + 't', compresslevel=6, encoding='utf-8')
+    raw = open(file_name, binary + 'b')
+    try:
+        if binary == 'w':
+            stream = zstd().ZstdCompressor(level=3).stream_writer(raw)
+        else:
+            stream = zstd().ZstdDecompressor().stream_reader(raw)
+    except Exception:
+        raw.close()
+        raise
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+def text(value):
+    """The string csv.writer would write for a value, so both formats give back the same rows."""
+    if type(value) is str:
+        return value
+    return "" if value is None else str(value)
+
+
+def pack_strings(values):
+    """Encodes strings as NUL separated UTF-8, or with lengths when a value holds a NUL."""
+    joined = "\x00".join(values)
+    if joined.count("\x00") == len(values) - 1:
+        return b'\x00' + joined.encode('utf-8')
+    encoded = [value.encode('utf-8') for value in values]
+    lengths = array('I', map(len, encoded))
+    if sys.byteorder != 'little':
+        lengths.byteswap()
+    return b'\x01' + lengths.tobytes() + b''.join(encoded)
+
+
+def unpack_strings(payload, count):
+    """Decodes count strings written by pack_strings."""
+    if payload[:1] == b'\x00':
+        return payload[1:].decode('utf-8').split("\x00") if count else list()
+    lengths = array('I')
+    lengths.frombytes(payload[1:1 + 4 * count])
+    if sys.byteorder != 'little':
+        lengths.byteswap()
+    values = list()
+    pos = 1 + 4 * count
+    for length in lengths:
+        values.append(payload[pos:pos + length].decode('utf-8'))
+        pos += length
+    return values
+
+
+def encode_number(values, typecode):
+    """Returns the values as a typed array, None unless every one converts back to the same string."""
+    cast = int if typecode == 'q' else float
+    try:
+        numbers = array(typecode, map(cast, values))
+    except (ValueError, OverflowError):
+        return None
+    if list(map(repr, numbers)) != values:  # Leading zeros, '1e3', '-0' and the like stay text
+        return None
+    if sys.byteorder != 'little':
+        numbers.byteswap()
+    return numbers.tobytes()
+
+
+def encode_column(values):
+    """Returns the kind and the uncompressed payload of one column of a row group.
+
+    Values that repeat are kept as codes into their distinct values,
+    which is also the fastest to read back. Otherwise integers and
+    floats are kept as 8 byte numbers and anything else as plain strings."""
+    codes = dict()
+    for value in values:
+        codes.setdefault(value, len(codes))
+    if len(codes) <= len(values) // 2:
+        indexes = array('I', map(codes.__getitem__, values))
+        if sys.byteorder != 'little':
+            indexes.byteswap()
+        distinct = pack_strings(list(codes))
+        return b'D', LENGTH.pack(len(codes)) + LENGTH.pack(len(distinct)) + distinct + indexes.tobytes()
+    for typecode in ('q', 'd'):
+        payload = encode_number(values, typecode)
+        if payload is not None:
+            return typecode.encode('ascii'), payload
+    return b'S', pack_strings(values)
+
+
+def decode_column(kind, payload, count):
+    """Gives back the strings of a column encoded by encode_column."""
+    if kind in (b'q', b'd'):
+        numbers = array(kind.decode('ascii'))
+        numbers.frombytes(payload)
+        if sys.byteorder != 'little':
+            numbers.byteswap()
+        return list(map(repr, numbers))
+    if kind == b'D':
+        (size,), (length,) = LENGTH.unpack_from(payload, 0), LENGTH.unpack_from(payload, 4)
+        distinct = unpack_strings(payload[8:8 + length], size)
+        indexes = array('I')
+        indexes.frombytes(payload[8 + length:])
+        if sys.byteorder != 'little':
+            indexes.byteswap()
+        return list(map(distinct.__getitem__, indexes))
+    if kind == b'S':
+        return unpack_strings(payload, count)
+    raise ValueError("Unknown column kind " + repr(kind))
+
+
+def write_columnar(file, header, rows, row_group_size=ROW_GROUP_SIZE):
+    """Writes the header and rows to a binary file object in row groups.
+
+    Every row must have one value per header column. Returns the number
+    of rows written."""
+    width = len(header)
+    meta = json.dumps({"header": list(header)}).encode('utf-8')
+    file.write(COLUMNAR_MAGIC + LENGTH.pack(len(meta)) + meta)
+    count = 0
+    for group in pipeline.chunked(rows, row_group_size):
+        for row in group:
+            if len(row) != width:
+                raise ValueError("Row " + str(count + 1) + " has " + str(len(row)) + " fields, expected "
+                                 + str(width) + ". Uneven rows can only be saved as csv.")
+            count += 1
+        file.write(LENGTH.pack(len(group)))
+        for j in range(width):
+            kind, payload = encode_column([text(row[j]) for row in group])
+            payload = zlib.compress(payload, 1)
+            file.write(COLUMN.pack(kind, len(payload)) + payload)
+    file.write(LENGTH.pack(0))  # No more row groups
+    return count
+
+
+def read_exact(file, size):
+    """Reads size bytes, raising ValueError when the file ends first."""
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("The columnar file is truncated.")
+    return data
+
+
+def read_columnar(file):
+    """Yields the header once, then the rows of each row group as lists of lists."""
+    if file.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar file.")
+    (length,) = LENGTH.unpack(read_exact(file, LENGTH.size))
+    header = json.loads(read_exact(file, length).decode('utf-8'))["header"]
+    yield header
+    while True:
+        (count,) = LENGTH.unpack(read_exact(file, LENGTH.size))
+        if not count:
+            return
+        with pipeline.gc_paused():  # Nothing here can form a cycle, collections would only walk the rows
+            columns = list()
+            for _ in header:
+                kind, size = COLUMN.unpack(read_exact(file, COLUMN.size))
+                columns.append(decode_column(kind, zlib.decompress(read_exact(file, size)), count))
+            rows = list(map(list, zip(*columns))) if columns else [list() for _ in range(count)]
+        yield rows
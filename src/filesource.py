@@ -1,67 +1,282 @@
 '''
 Created on Feb 12, 2018
 
-Handles file I/O of csv files.
+Handles file I/O of csv files, plain, compressed
+or in the columnar format of fileformat.
 
 @author: Philip Deck
 '''
 import csv
+import io
+import logging
+import os
+from collections import deque
+from itertools import chain, islice
+from mmap import mmap, ACCESS_READ
+import fileformat
+import metrics
+import pipeline
+
+log = logging.getLogger(__name__)
+
+BLOCK_SIZE = 1 << 24  # Bytes scanned at a time when counting quotes
+
+
+def count_quotes(view, start, end):
+    """Counts the quote characters between two byte offsets."""
+    quotes = 0
+    for block in range(start, end, BLOCK_SIZE):
+        quotes += view[block:min(block + BLOCK_SIZE, end)].count(b'"')
+    return quotes
+
+
+def record_boundaries(file_name, part_size):
+    """Returns byte offsets splitting the file into parts of about part_size bytes.
+
+    Every offset is just after a newline that ends a record. A newline
+    inside a quoted field has an odd number of quotes before it, doubled
+    quotes inside a field count twice and keep the parity, so only the
+    newlines after an even number of quotes are used."""
+    size = os.path.getsize(file_name)
+    bounds = [0]
+    if size == 0:
+        return bounds
+    with open(file_name, 'rb') as file, mmap(file.fileno(), 0, access=ACCESS_READ) as view:
+        quotes = 0
+        pos = 0
+        for target in range(part_size, size, part_size):
+            if target <= pos:
+                continue
+            quotes += count_quotes(view, pos, target)
+            pos = target
+            while pos < size:
+                newline = view.find(b'\n', pos)
+                if newline == -1:
+                    newline = size - 1
+                quotes += count_quotes(view, pos, newline + 1)
+                pos = newline + 1
+                if quotes % 2 == 0:
+                    break
+            if pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return bounds
+
+
+def parse_records(chunk):
+    """Parses raw bytes like parse_bytes, also telling whether they end inside a quoted field.
+
+    csv.reader only reads past the last line when a quote is still open,
+    so a row returned after the lines ran out was cut off mid-record."""
+    lines_done = list()
+
+    def lines():
+        yield from io.TextIOWrapper(io.BytesIO(chunk), encoding='utf-8')
+        lines_done.append(True)
+
+    rows = list()
+    cut = False
+    for row in csv.reader(lines()):
+        cut = bool(lines_done)
+        rows.append(row)
+    return rows, cut
+
+
+def parse_bytes(chunk):
+    """Parses whole records from raw bytes, the same way open_file and csv.reader do."""
+    return parse_records(chunk)[0]
+
+
+def parse_range(file_name, start, end):
+    """Parses the records between two boundaries, returns them and whether the last one was cut off."""
+    with open(file_name, 'rb') as file:
+        file.seek(start)
+        return parse_records(file.read(end - start))
 
 
 class FileSource():
     '''Handles file I/O of csv files.'''
 
-    def __init__(self, file_name):
+    def __init__(self, file_name, processes=1, file_format=None):
         '''Constructor'''
         self.file_name = file_name
         self.file = None
-        
+        self.processes = processes  # Worker processes used to parse, 1 parses in this process
+        self.file_format = file_format or fileformat.format_of(file_name)  # One of fileformat.FORMATS
+        fileformat.check_format(self.file_format)
+
+    def is_plain(self):
+        """Whether the file is uncompressed csv, which is all mmap, offsets and LOAD DATA work on."""
+        return self.file_format == "csv"
+
     def load_data(self):
         """Iterates through csv file with csv.reader and adds entries to a list."""
+        if (self.processes > 1 and self.is_plain()) or self.file_format == "columnar":
+            rows = self.iter_rows()
+            header = next(rows, list())
+            data = list()
+            for batch in rows:
+                data.extend(batch)
+            return header, data
         
         try:
-            print("Loading data...")
-            self.open_file()
-            reader = csv.reader(self.file)
-            
-            data = list()
-            for i, line in enumerate(reader):
-                data.insert(i, line)
+            log.info("Loading data from %s", self.file_name)
+            with metrics.span("file.parse", file=self.file_name) as span:
+                self.open_file()
+                reader = csv.reader(self.file)
+                
+                data = list()
+                for i, line in enumerate(reader):
+                    data.insert(i, line)
 
-            header = data[0]
-            del data[0] #Delete the first header line
-            
+                header = data[0]
+                del data[0] #Delete the first header line
+                span.add(rows=len(data))
+            metrics.count("file.rows", len(data))
+            metrics.count("file.bytes", os.path.getsize(self.file_name))
             
         except FileNotFoundError:
-            print("File", self.file_name, "not found.")    
+            log.error("File %s not found.", self.file_name)
         finally:
             self.close_file()
 
         return header, data
-            
-    def save_file(self, data, header):
-        """Saves a file to csv format with headers as the first line."""
+
+    def iter_rows(self, batch_size=10000):
+        """Yields the header once, then lists of at most batch_size rows.
+
+        Columnar files are read a row group at a time instead, whatever
+        batch_size is."""
+        if self.file_format == "columnar":
+            yield from self.iter_columnar()
+            return
+        if self.processes > 1 and self.is_plain():
+            rows = chain.from_iterable(self.iter_ranges())
+            header = next(rows, None)
+            if header is not None:
+                yield header
+                yield from pipeline.chunked(rows, batch_size)
+            return
+
         try:
-            print("Loading data...")
-            self.open_file('w')
-            writer = csv.writer(self.file,lineterminator="\n", quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            
-            writer.writerow(header)
-            writer.writerows(data)
+            self.open_file()
+            reader = csv.reader(self.file)
+
+            header = next(reader, None)  # The first line is the header
+            if header is None:
+                return
+            yield header
+
+            batch = list()
+            for line in reader:
+                batch.append(line)
+                if len(batch) >= batch_size:
+                    metrics.count("file.rows", len(batch))
+                    yield batch
+                    batch = list()
+            if batch:
+                metrics.count("file.rows", len(batch))
+                yield batch
+            metrics.count("file.bytes", os.path.getsize(self.file_name))
+        finally:
+            self.close_file()
             
+    def iter_columnar(self):
+        """Yields the header of a columnar file, then the rows of each row group."""
+        with open(self.file_name, 'rb') as file:
+            with metrics.span("file.open", file=self.file_name):
+                groups = fileformat.read_columnar(file)
+                header = next(groups)
+            yield header
+            for rows in groups:
+                metrics.count("file.rows", len(rows))
+                yield rows
+        metrics.count("file.bytes", os.path.getsize(self.file_name))
+
+    def iter_ranges(self, part_size=None):
+        """Parses the file in a process pool, yielding each range's rows in file order.
+
+        The parts are found by quote parity, which a stray quote inside an
+        unquoted field throws off. A range ending inside a quoted field or
+        rows that don't match the header's width give that away, the rest
+        of the file is then read with a single csv.reader so the rows stay
+        the same as a plain read."""
+        from concurrent.futures import ProcessPoolExecutor  # Pulls in multiprocessing, so only when used
+        size = os.path.getsize(self.file_name)
+        if part_size is None:
+            part_size = max(1 << 20, min(1 << 25, size // (self.processes * 4) + 1))
+        bounds = record_boundaries(self.file_name, part_size)
+        ranges = iter(zip(bounds, bounds[1:]))
+
+        width = None
+        emitted = 0  # Rows yielded so far, header included
+        with ProcessPoolExecutor(self.processes) as pool:
+            pending = deque(pool.submit(parse_range, self.file_name, start, end)
+                            for start, end in islice(ranges, self.processes * 2))
+            while pending:
+                rows, cut = pending.popleft().result()
+                if width is None and rows:
+                    width = len(rows[0])
+                if cut or any(len(row) != width for row in rows):
+                    log.warning("%s was split inside a record, reading the rest in one process.", self.file_name)
+                    for future in pending:
+                        future.cancel()
+                    break
+                for start, end in islice(ranges, 1):
+                    pending.append(pool.submit(parse_range, self.file_name, start, end))
+                emitted += len(rows)
+                metrics.count("file.rows", len(rows))
+                yield rows
+            else:
+                return
+
+        try:
+            self.open_file()
+            yield from pipeline.chunked(islice(csv.reader(self.file), emitted, None), 10000)
         finally:
             self.close_file()
+
+    def save_file(self, data, header):
+        """Saves a file to csv format with headers as the first line.
+
+        Compressed csv is compressed as it is written, the columnar format
+        is written a row group at a time."""
+        log.info("Saving data to %s as %s", self.file_name, self.file_format)
+        with metrics.span("file.save", file=self.file_name, format=self.file_format):
+            if self.file_format == "columnar":
+                with open(self.file_name, 'wb') as file:
+                    fileformat.write_columnar(file, header, data)
+            else:
+                try:
+                    self.open_file('w')
+                    writer = csv.writer(self.file,lineterminator="\n", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+                    
+                    writer.writerow(header)
+                    writer.writerows(data)
+                    
+                finally:
+                    self.close_file()
+        metrics.count("file.bytes_written", os.path.getsize(self.file_name))
+    
+    def get_line_terminator(self):
+        """Returns the line ending used by the file, read from its first line."""
+        if not self.is_plain():
+            return "\n"  # Always written with \n, and only plain files are sent to the server
+        with open(self.file_name, 'rb') as file:
+            line = file.readline()
+        return "\r\n" if line.endswith(b"\r\n") else "\n"
     
     def open_file(self, open_type ="rt"):
         """Opens a file with the file name provided."""
         try:
-            self.file = open(self.file_name, open_type, encoding='utf-8')
+            with metrics.span("file.open", file=self.file_name):
+                self.file = fileformat.open_text(self.file_name, open_type, self.file_format)
         except FileNotFoundError:
-            print("File", self.file_name, "not found.")
+            log.error("File %s not found.", self.file_name)
     
     def close_file(self):
         """Close the current file."""        
         try:
             self.file.close()
         except AttributeError:
-            print("File reader is already closed or None.")
+            log.debug("File reader is already closed or None.")
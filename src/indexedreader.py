@@ -0,0 +1,148 @@
+'''
+Created on Oct 18, 2026
+
+Random access to the rows of a csv file
+through a memory map and a row offset index.
+
+@author: Philip Deck
+'''
+import csv
+import logging
+import os
+import re
+import struct
+import sys
+from array import array
+from mmap import mmap, ACCESS_READ
+import filesource
+import metrics
+
+log = logging.getLogger(__name__)
+
+NEWLINE = re.compile(b'\n')
+INDEX_MAGIC = b'CSVIDX1\n'
+INDEX_HEADER = struct.Struct('<8sQQQ')  # Magic, file size, file mtime in ns, offset count
+
+
+def scan_records(view, start, stop, size, offsets):
+    """Appends record offsets found by csv.reader from start until a record ends at or past stop.
+
+    csv.reader pulls exactly the lines of one record before returning it,
+    so the position after each record is where the next one starts, stray
+    quotes and all. Returns that position."""
+    pos = start
+
+    def lines():
+        nonlocal pos
+        while pos < size:
+            newline = view.find(b'\n', pos)
+            end = size if newline == -1 else newline + 1
+            line = view[pos:end].decode('utf-8', errors='replace')
+            pos = end
+            yield line
+
+    for _ in csv.reader(lines()):
+        offsets.append(pos)
+        if pos >= stop:
+            break
+    return pos
+
+
+def build_offsets(view, size):
+    """Returns the byte offset of every record, followed by the file size.
+
+    Blocks without any quote are split on every newline with a regex, the
+    others are walked record by record with csv.reader."""
+    offsets = array('Q', [0])
+    pos = 0  # Always the start of a record
+    while pos < size:
+        end = min(pos + filesource.BLOCK_SIZE, size)
+        block = view[pos:end]
+        last = block.rfind(b'\n')
+        if b'"' not in block and (last != -1 or end == size):
+            offsets.extend(match.end() + pos for match in NEWLINE.finditer(block))
+            pos = pos + last + 1 if last != -1 else end
+        else:
+            pos = scan_records(view, pos, end, size, offsets)
+    if offsets[-1] != size:  # The last record has no newline
+        offsets.append(size)
+    return offsets
+
+
+class IndexedReader():
+    '''Read-only, list-like access to the rows of a csv file.
+
+    The file is memory mapped and only the byte offset of every row is kept,
+    rows are parsed when they are asked for. The index is saved next to the
+    file and reused while the file's size and modification time match.'''
+
+    def __init__(self, file_name):
+        '''Constructor'''
+        self.file_name = file_name
+        self.file = open(file_name, 'rb')
+        stat = os.fstat(self.file.fileno())
+        self.view = mmap(self.file.fileno(), 0, access=ACCESS_READ) if stat.st_size else b''
+        self.offsets = self.load_index(stat)
+        if self.offsets is None:
+            log.info("Indexing %s...", file_name)
+            with metrics.span("file.index", bytes=stat.st_size):
+                self.offsets = build_offsets(self.view, stat.st_size)
+            self.save_index(stat)
+        self.header = self.parse(0, 1)[0] if len(self.offsets) > 1 else list()
+
+    def index_path(self):
+        """The index is kept next to the csv file."""
+        return self.file_name + ".idx"
+
+    def load_index(self, stat):
+        """Returns the saved offsets, None if missing or out of date."""
+        try:
+            with open(self.index_path(), 'rb') as file:
+                magic, size, mtime, count = INDEX_HEADER.unpack(file.read(INDEX_HEADER.size))
+                if magic != INDEX_MAGIC or size != stat.st_size or mtime != stat.st_mtime_ns:
+                    return None
+                offsets = array('Q')
+                offsets.fromfile(file, count)
+        except (OSError, EOFError, struct.error):
+            return None
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        return offsets
+
+    def save_index(self, stat):
+        """Saves the offsets, the index is only a cache so failing to write is fine."""
+        offsets = array('Q', self.offsets)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        try:
+            with open(self.index_path(), 'wb') as file:
+                file.write(INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(offsets)))
+                offsets.tofile(file)
+        except OSError as err:
+            log.warning("Could not save the index: %s", err)
+
+    def parse(self, start, stop):
+        """Parses records start to stop, the header being record 0."""
+        return filesource.parse_bytes(self.view[self.offsets[start]:self.offsets[stop]])
+
+    def __len__(self):
+        return max(0, len(self.offsets) - 2)  # Without the header and the end offset
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            rows = range(len(self))[n]
+            if rows.step != 1:
+                return [self[i] for i in rows]
+            return self.parse(rows.start + 1, rows.stop + 1) if rows else list()
+        n = range(len(self))[n]  # Raises IndexError like a list
+        return self.parse(n + 1, n + 2)[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), 10000):
+            yield from self[start:start + 10000]
+
+    def close(self):
+        """Closes the memory map and the file."""
+        if isinstance(self.view, mmap):
+            self.view.close()
+        self.file.close()
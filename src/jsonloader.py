@@ -0,0 +1,156 @@
+'''
+Created on Oct 18, 2026
+
+Keeps the recent imports JSON file and a
+snapshot of the rows each import loaded.
+
+@author: Philip Deck
+'''
+import hashlib
+import json
+import logging
+import os
+import pickle
+import metrics
+import pipeline
+
+log = logging.getLogger(__name__)
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+RECENT_FILE = os.path.join(FOLDER, "recent_imports.json")
+SNAPSHOT_FOLDER = os.path.join(FOLDER, "snapshots")
+SNAPSHOT_MAGIC = b'CSVSNAP1'
+
+
+def estimate_size(data, sample_rows=1000):
+    """Guesses how many bytes data pickles to from an even sample of its rows."""
+    if not len(data):
+        return 0
+    sample = data[::max(1, len(data) // sample_rows)]
+    return len(pickle.dumps(list(sample), pickle.HIGHEST_PROTOCOL)) * len(data) // len(sample)
+
+
+def label(entry):
+    """The name shown for an entry in the Recent Imports menu."""
+    source = entry["source"]
+    if source["type"] == "file":
+        return os.path.basename(source["file_name"])
+    return source["db_name"] + "." + source["table_name"] + " on " + source["db_host"]
+
+
+class JSONLoader():
+    '''The recent imports, most recent first, with a snapshot of each one's header and rows.
+
+    A source is a dict naming a csv file or a table, a version is what
+    the source looked like when it was read: the file's size and
+    modification time or the table's checksum. A snapshot is only used
+    while the version still matches. Snapshots past max_entries or
+    past max_bytes altogether are deleted, least recently used first,
+    and one that would be deleted right away isn't written at all.'''
+
+    def __init__(self, file_name=RECENT_FILE, snapshot_folder=SNAPSHOT_FOLDER,
+                 max_entries=10, max_bytes=1 << 30):
+        '''Constructor'''
+        self.file_name = file_name
+        self.snapshot_folder = snapshot_folder
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = self.load()
+
+    def load(self):
+        """Reads the recent imports, an empty list when there are none yet."""
+        try:
+            with open(self.file_name, encoding='utf-8') as file:
+                entries = json.load(file)
+            return [entry for entry in entries if "source" in entry]
+        except (OSError, ValueError, TypeError):
+            return list()
+
+    def save(self):
+        """Writes the recent imports, the list is only a convenience so failing is fine."""
+        try:
+            with open(self.file_name + ".tmp", 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file, indent=2)
+            os.replace(self.file_name + ".tmp", self.file_name)
+        except OSError as err:
+            log.warning("Could not save the recent imports: %s", err)
+
+    def find(self, source):
+        """Returns the entry for a source, None if it isn't recent."""
+        for entry in self.entries:
+            if entry["source"] == source:
+                return entry
+        return None
+
+    def snapshot_path(self, source):
+        """Every source gets its own snapshot file, named after a hash of the source."""
+        key = hashlib.sha1(json.dumps(source, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.snapshot_folder, key + ".snapshot")
+
+    def load_snapshot(self, source, version):
+        """Returns the (header, data) saved for a source at the same version, otherwise None."""
+        entry = self.find(source)
+        if entry is None or version is None or entry["version"] != version or not entry["size"]:
+            return None
+        try:
+            with open(self.snapshot_path(source), 'rb') as file:
+                if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    return None
+                with pipeline.gc_paused(), metrics.span("snapshot.load") as span:
+                    header, data = pickle.load(file)
+                    span.add(rows=len(data))
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError) as err:
+            log.warning("Could not read the snapshot: %s", err)
+            return None
+        self.entries.remove(entry)
+        self.entries.insert(0, entry)  # Most recently used
+        self.save()
+        return header, data
+
+    def save_snapshot(self, source, version, header, data):
+        """Records a source as the most recent import along with a snapshot of its rows.
+
+        With version None the source is only listed, without a snapshot."""
+        entry = self.find(source)
+        if entry is not None:
+            self.entries.remove(entry)
+        entry = {"source": source, "version": version, "size": 0}
+        self.entries.insert(0, entry)
+        path = self.snapshot_path(source)
+        if version is None:
+            self.delete_snapshot(entry)  # One saved earlier is out of date
+        elif estimate_size(data) > self.max_bytes:
+            log.info("Not saving a snapshot of %s, it would be over %d bytes.", label(entry), self.max_bytes)
+            self.delete_snapshot(entry)
+        else:
+            try:
+                os.makedirs(self.snapshot_folder, exist_ok=True)
+                with open(path + ".tmp", 'wb') as file:
+                    file.write(SNAPSHOT_MAGIC)
+                    pickle.dump((header, data), file, pickle.HIGHEST_PROTOCOL)
+                os.replace(path + ".tmp", path)
+                entry["size"] = os.path.getsize(path)
+            except (OSError, pickle.PicklingError) as err:
+                log.warning("Could not save the snapshot: %s", err)
+        self.evict()
+        self.save()
+
+    def evict(self):
+        """Deletes snapshots past the limits, least recently used first."""
+        total = 0
+        for i, entry in enumerate(list(self.entries)):
+            if i >= self.max_entries:
+                self.entries.remove(entry)
+                self.delete_snapshot(entry)
+            elif total + entry["size"] > self.max_bytes:
+                self.delete_snapshot(entry)  # Stays in the menu, the next import reads the source
+            else:
+                total += entry["size"]
+
+    def delete_snapshot(self, entry):
+        """Removes an entry's snapshot file."""
+        entry["size"] = 0
+        try:
+            os.remove(self.snapshot_path(entry["source"]))
+        except OSError:
+            pass
@@ -3,14 +3,28 @@ Created on Feb 12, 2018
 
 Initial class that runs the show.
 
+Set CSVLOADER_LOG to a level like DEBUG for more detail, and
+CSVLOADER_METRICS to log the timing spans and counters too.
+
 @author: Philip Deck
 '''
+import time
+STARTED = time.time()  # Before the other imports, the startup time includes them
+
+import logging
+import os
+import metrics
 import window
 
 if __name__ == '__main__':
-    
-    app = window.Window()
+
+    logging.basicConfig(level=os.environ.get("CSVLOADER_LOG", "INFO").upper(),
+                        format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if os.environ.get("CSVLOADER_METRICS"):
+        metrics.add_sink(metrics.LoggingSink())
+
+    app = window.Window(STARTED)
     app.mainloop()
-    
+
     print("Program created by Philip Deck")
-    print(" Ran for {0:.2f} seconds.".format(app.get_uptime()))
\ No newline at end of file
+    print(" Ran for {0:.2f} seconds.".format(app.get_uptime()))
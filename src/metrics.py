@@ -0,0 +1,142 @@
+'''
+Created on Oct 18, 2026
+
+Timing spans and counters for the slow paths,
+reported to whichever sinks are plugged in.
+
+@author: Philip Deck
+'''
+import logging
+import threading
+import time
+
+_sinks = list()  # Called with every event, nothing is measured while there are none
+
+
+def add_sink(sink):
+    """Starts sending events to sink, a callable taking one event dict.
+
+    Events are {"kind": "span", "name", "seconds", "fields"} once a span
+    ends and {"kind": "count", "name", "value", "fields"} per count. Sinks
+    are called on whichever thread did the work."""
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    """Stops sending events to sink."""
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+def enabled():
+    """Whether any sink is listening."""
+    return bool(_sinks)
+
+
+def emit(event):
+    """Hands an event to every sink."""
+    for sink in list(_sinks):
+        sink(event)
+
+
+def count(name, value=1, **fields):
+    """Adds value to a counter, such as rows or bytes read."""
+    if _sinks:
+        emit({"kind": "count", "name": name, "value": value, "fields": fields})
+
+
+class NoSpan():
+    '''Stands in for a span while nothing listens, so timing costs one call and a check.'''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **fields):
+        """Ignores fields."""
+
+
+NO_SPAN = NoSpan()
+
+
+class Span():
+    '''Times a block of work, reported once the block ends.'''
+
+    def __init__(self, name, fields):
+        '''Constructor'''
+        self.name = name
+        self.fields = fields
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        emit({"kind": "span", "name": self.name, "seconds": seconds, "fields": self.fields})
+        return False
+
+    def add(self, **fields):
+        """Adds fields only known once the work is done, like a row count."""
+        self.fields.update(fields)
+
+
+def span(name, **fields):
+    """Returns a context manager timing the block it wraps under name."""
+    if _sinks:
+        return Span(name, fields)
+    return NO_SPAN
+
+
+class LoggingSink():
+    '''Logs every event as one line.'''
+
+    def __init__(self, logger=None, level=logging.INFO):
+        '''Constructor'''
+        self.logger = logger or logging.getLogger("metrics")
+        self.level = level
+
+    def __call__(self, event):
+        fields = " ".join(key + "=" + str(value) for key, value in event["fields"].items())
+        if event["kind"] == "span":
+            self.logger.log(self.level, "span %s %.6fs %s", event["name"], event["seconds"], fields)
+        else:
+            self.logger.log(self.level, "count %s +%s %s", event["name"], event["value"], fields)
+
+
+class Totals():
+    '''Adds events up per name, for reading out at the end of a run.'''
+
+    def __init__(self):
+        '''Constructor'''
+        self.lock = threading.Lock()
+        self.counts = dict()  # Name to total value
+        self.spans = dict()  # Name to [calls, total seconds, longest seconds]
+
+    def __call__(self, event):
+        with self.lock:
+            if event["kind"] == "span":
+                totals = self.spans.setdefault(event["name"], [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += event["seconds"]
+                totals[2] = max(totals[2], event["seconds"])
+            else:
+                self.counts[event["name"]] = self.counts.get(event["name"], 0) + event["value"]
+
+    def snapshot(self):
+        """Returns the totals so far as plain dicts."""
+        with self.lock:
+            return {"counts": dict(self.counts),
+                    "spans": {name: {"calls": calls, "seconds": round(total, 6), "longest": round(longest, 6)}
+                              for name, (calls, total, longest) in self.spans.items()}}
+
+    def clear(self):
+        """Starts the totals over."""
+        with self.lock:
+            self.counts.clear()
+            self.spans.clear()
@@ -0,0 +1,92 @@
+'''
+Created on Oct 18, 2026
+
+Helpers for moving rows between sources in bounded chunks.
+
+@author: Philip Deck
+'''
+import gc
+import queue
+import threading
+from contextlib import contextmanager
+
+_DONE = object()  # Marks the end of the producer's output
+
+
+@contextmanager
+def gc_paused():
+    """Pauses the cyclic garbage collector while millions of rows are allocated.
+
+    Each collection walks every row allocated so far, which can cost more
+    than building the rows themselves."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def chunked(rows, chunk_size):
+    """Yields lists of at most chunk_size rows from any iterable of rows."""
+    chunk = list()
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
+
+
+def counted(batches, progress=None):
+    """Passes batches through, calling progress with the running row count."""
+    count = 0
+    for batch in batches:
+        yield batch
+        count += len(batch)
+        if progress:
+            progress(count)
+
+
+def prefetch(items, maxsize=2):
+    """Produces items on a background thread while the caller consumes them.
+
+    At most maxsize items wait in the queue, so the producer blocks when the
+    consumer falls behind. Errors raised by the producer are re-raised in
+    the consumer."""
+    qu = queue.Queue(maxsize)
+    stop = threading.Event()  # Set when the consumer stops early
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                qu.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as err:  # Hand the error over to the consumer
+            put(err)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = qu.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
@@ -0,0 +1,143 @@
+'''
+Created on Oct 18, 2026
+
+A list of rows stored in chunks for
+fast positional inserts and deletes.
+
+@author: Philip Deck
+'''
+from itertools import chain, islice
+
+CHUNK_SIZE = 512  # Rows per chunk after a split, chunks split at twice that
+
+
+class RowList():
+    '''A list of rows kept in chunks, indexed by a Fenwick tree of their lengths.
+
+    Finding a position takes O(log k) for k chunks and inserting or deleting
+    only moves the rows of one chunk, instead of shifting everything after
+    it like list.insert and del do. Supports the list operations the rest
+    of the application uses.'''
+
+    def __init__(self, rows=()):
+        '''Constructor'''
+        rows = list(rows)
+        self.chunks = [rows[i:i + CHUNK_SIZE] for i in range(0, len(rows), CHUNK_SIZE)]
+        self.length = len(rows)
+        self.rebuild()
+
+    def rebuild(self):
+        """Rebuilds the Fenwick tree after chunks were added or removed."""
+        self.tree = [0] * (len(self.chunks) + 1)
+        for i, chunk in enumerate(self.chunks, 1):
+            self.tree[i] += len(chunk)
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+        self.top = 1 << (len(self.chunks).bit_length() - 1) if self.chunks else 0
+
+    def add(self, i, delta):
+        """Changes the length of chunk i by delta in the tree."""
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def locate(self, n):
+        """Returns the chunk holding index n and the index within that chunk."""
+        pos = 0
+        bit = self.top
+        while bit:
+            nxt = pos + bit
+            if nxt < len(self.tree) and self.tree[nxt] <= n:
+                pos = nxt
+                n -= self.tree[nxt]
+            bit >>= 1
+        return pos, n
+
+    def index(self, n):
+        """Turns a possibly negative index into a position, raising IndexError like a list."""
+        if n < 0:
+            n += self.length
+        if not 0 <= n < self.length:
+            raise IndexError("RowList index out of range")
+        return n
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return chain.from_iterable(self.chunks)
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return "RowList(" + repr(list(self)) + ")"
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            start, stop, step = n.indices(self.length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return list()
+            i, offset = self.locate(start)
+            return list(islice(chain(self.chunks[i][offset:], chain.from_iterable(self.chunks[i + 1:])),
+                               stop - start))
+        i, offset = self.locate(self.index(n))
+        return self.chunks[i][offset]
+
+    def __setitem__(self, n, row):
+        """Replaces the row at index n in place."""
+        i, offset = self.locate(self.index(n))
+        self.chunks[i][offset] = row
+
+    def __delitem__(self, n):
+        i, offset = self.locate(self.index(n))
+        del self.chunks[i][offset]
+        self.length -= 1
+        if self.chunks[i]:
+            self.add(i, -1)
+        else:
+            del self.chunks[i]
+            self.rebuild()
+
+    def insert(self, n, row):
+        """Inserts a row before index n, like list.insert."""
+        if n < 0:
+            n = max(0, n + self.length)
+        if not self.chunks:
+            self.chunks.append(list())
+            self.rebuild()
+        if n >= self.length:
+            i, offset = len(self.chunks) - 1, len(self.chunks[-1])
+        else:
+            i, offset = self.locate(n)
+        chunk = self.chunks[i]
+        chunk.insert(offset, row)
+        self.length += 1
+        if len(chunk) > 2 * CHUNK_SIZE:
+            self.chunks.insert(i + 1, chunk[CHUNK_SIZE:])
+            del chunk[CHUNK_SIZE:]
+            self.rebuild()
+        else:
+            self.add(i, 1)
+
+    def append(self, row):
+        """Adds a row at the end."""
+        self.insert(self.length, row)
+
+    def extend(self, rows):
+        """Adds rows at the end."""
+        rows = list(rows)
+        if self.chunks and len(self.chunks[-1]) < CHUNK_SIZE:
+            room = CHUNK_SIZE - len(self.chunks[-1])
+            self.chunks[-1].extend(rows[:room])
+            rows = rows[room:]
+        self.chunks.extend(rows[i:i + CHUNK_SIZE] for i in range(0, len(rows), CHUNK_SIZE))
+        self.length = sum(map(len, self.chunks))
+        self.rebuild()
@@ -0,0 +1,249 @@
+'''
+Created on Oct 18, 2026
+
+Hash and sorted indexes over the columns
+of loaded rows for fast searches.
+
+@author: Philip Deck
+'''
+from bisect import bisect_left, bisect_right, insort
+from decimal import Decimal
+from itertools import chain
+from operator import itemgetter
+import pipeline
+import rowlist
+import typeinfer
+
+OPERATORS = ("=", "<", "<=", ">", ">=", "starts with")
+TAG_GAP = 1 << 32  # Room between neighbouring tags for rows inserted later
+MIN_GAP = 1 << 16  # Least room left between tags spread out again around a crowded spot
+
+
+def value_key(value):
+    """Orders numbers by value, even when held as csv text, and everything else as text.
+
+    Empty values and NULL come last. Numbers are equal by value, so
+    '60.9', '60.90' and Decimal('60.9') are one key."""
+    if type(value) is str:  # Nearly every value in a csv file
+        if not value:
+            return (2, "")
+        if typeinfer.INTEGER.match(value) or typeinfer.DECIMAL.match(value):
+            return (0, Decimal(value))
+        return (1, value)
+    if value is None:
+        return (2, "")
+    if isinstance(value, bool):
+        return (0, int(value))
+    if isinstance(value, (int, float, Decimal)):
+        return (0, value)
+    if isinstance(value, str):
+        return value_key(str(value))  # A str subclass
+    return (1, str(value))
+
+
+def text_key(value):
+    """A value as the text shown to the user, for prefix searches."""
+    return "" if value is None else str(value)
+
+
+class FilteredRows():
+    '''The rows matching a search, in data order, read from the data only when shown.
+
+    Supports len(), indexing and slicing so it can be shown like the data
+    itself. It goes stale once the data is edited.'''
+
+    def __init__(self, index, tags):
+        '''Constructor'''
+        self.index = index
+        self.tags = tags  # Sorted tags of the matching rows
+
+    def position(self, i):
+        """Returns the position in the data of match i."""
+        return bisect_left(self.index.tags, self.tags[i])
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self.index.data[self.position(i)] for i in range(len(self.tags))[n]]
+        return self.index.data[self.position(range(len(self.tags))[n])]
+
+    def __iter__(self):
+        for i in range(len(self.tags)):
+            yield self.index.data[self.position(i)]
+
+
+class RowIndex():
+    '''Search indexes over the columns of a list of rows, kept up to date as rows are edited.
+
+    Every row gets a tag, tags increase in data order and never change
+    when other rows are inserted or deleted, so the indexes hold tags
+    instead of positions. A column's hash index (value to tags, for
+    equality) and sorted index ((value, tag) pairs, for ranges) are only
+    built the first time the column is searched.'''
+
+    def __init__(self, data):
+        '''Constructor'''
+        self.data = data  # The rows indexed, a RowList or a ColumnStore
+        self.relabel()
+
+    def relabel(self):
+        """Spreads the tags out again and drops the indexes that held the old ones."""
+        self.tags = rowlist.RowList(range(0, len(self.data) * TAG_GAP, TAG_GAP))
+        self.hashes = dict()  # Column to {value key: set of tags}
+        self.sorted = dict()  # (column, key function) to a sorted list of (key, tag)
+
+    @staticmethod
+    def cell(row, column):
+        """A row's value in a column, None when the row is too short."""
+        return row[column] if column < len(row) else None
+
+    def groups(self, column, key):
+        """Returns {key: tags in data order} for a column, computing each distinct value's key once."""
+        try:
+            values = map(itemgetter(column), self.data)
+            by_value = dict()
+            for tag, value in zip(self.tags, values):
+                by_value.setdefault(value, list()).append(tag)
+        except IndexError:  # Some rows are too short
+            by_value = dict()
+            for tag, row in zip(self.tags, self.data):
+                by_value.setdefault(self.cell(row, column), list()).append(tag)
+        by_key = dict()
+        for value, tags in by_value.items():
+            by_key.setdefault(key(value), list()).append(tags)
+        return {k: sorted(chain.from_iterable(tags)) if len(tags) > 1 else tags[0] for k, tags in by_key.items()}
+
+    def hash_index(self, column):
+        """Returns the column's hash index, building it the first time."""
+        if column not in self.hashes:
+            with pipeline.gc_paused():
+                self.hashes[column] = {k: set(tags) for k, tags in self.groups(column, value_key).items()}
+        return self.hashes[column]
+
+    def sorted_index(self, column, key):
+        """Returns the column's sorted index for a key function, building it the first time."""
+        if (column, key) not in self.sorted:
+            with pipeline.gc_paused():
+                groups = self.groups(column, key)
+                self.sorted[column, key] = [(k, tag) for k in sorted(groups) for tag in groups[k]]
+        return self.sorted[column, key]
+
+    def matches(self, column, op, value):
+        """Returns the tags of the rows where the column's value op value holds."""
+        if op == "=":
+            return self.hash_index(column).get(value_key(value), set())
+        if op == "starts with":
+            index = self.sorted_index(column, text_key)
+            prefix = text_key(value)
+            start = bisect_left(index, (prefix,))
+            stop = start
+            while stop < len(index) and index[stop][0].startswith(prefix):
+                stop += 1
+            return [tag for _, tag in index[start:stop]]
+        if op not in OPERATORS:
+            raise ValueError("Unknown operator " + repr(op))
+
+        index = self.sorted_index(column, value_key)
+        key = value_key(value)
+        start, stop = 0, bisect_left(index, ((2,),))  # Empty values never match a range
+        if op == "<":
+            stop = min(stop, bisect_left(index, (key,)))
+        elif op == "<=":
+            stop = min(stop, bisect_right(index, (key, float("inf"))))
+        elif op == ">":
+            start = bisect_right(index, (key, float("inf")))
+        elif op == ">=":
+            start = bisect_left(index, (key,))
+        return [tag for _, tag in index[start:stop]]
+
+    def search(self, conditions):
+        """Returns the rows matching every (column, op, value) condition."""
+        found = sorted((self.matches(column, op, value) for column, op, value in conditions), key=len)
+        if not found:
+            return FilteredRows(self, list())
+        tags = set(found[0])  # Narrowed down from the fewest matches
+        for matches in found[1:]:
+            tags = tags & matches if isinstance(matches, set) else tags.intersection(matches)
+        return FilteredRows(self, sorted(tags))
+
+    def add(self, tag, row):
+        """Adds a row's values to the indexes built so far."""
+        for column, index in self.hashes.items():
+            index.setdefault(value_key(self.cell(row, column)), set()).add(tag)
+        for (column, key), index in self.sorted.items():
+            insort(index, (key(self.cell(row, column)), tag))
+
+    def remove(self, tag, row):
+        """Removes a row's values from the indexes built so far."""
+        for column, index in self.hashes.items():
+            value = value_key(self.cell(row, column))
+            index[value].discard(tag)
+            if not index[value]:
+                del index[value]
+        for (column, key), index in self.sorted.items():
+            del index[bisect_left(index, (key(self.cell(row, column)), tag))]
+
+    def insert(self, n, row):
+        """Indexes a row just inserted into the data at position n."""
+        n = max(0, min(n, len(self.tags)))
+        tag = self.free_tag(n)
+        if tag is None:  # No room left between the neighbours
+            self.spread(n)
+            tag = self.free_tag(n)
+        self.tags.insert(n, tag)
+        self.add(tag, row)
+
+    def free_tag(self, n):
+        """Returns a tag between the rows at n - 1 and n, None when their tags are adjacent."""
+        if not self.tags:
+            return 0
+        low = self.tags[n - 1] if n > 0 else self.tags[0] - 2 * TAG_GAP
+        high = self.tags[n] if n < len(self.tags) else low + 2 * TAG_GAP
+        tag = (low + high) // 2
+        return None if tag == low else tag
+
+    def spread(self, n):
+        """Spreads out the tags around position n to make room for a row there.
+
+        Only the rows of the smallest window around n, doubling in size,
+        whose tags can be MIN_GAP apart are given new tags, so inserting
+        over and over at one spot costs little. The new tags keep their
+        order, so the indexes built so far are updated in place. The data
+        already holds the new row at n, the tags don't yet."""
+        size = 1
+        while True:
+            start, stop = max(0, n - size), min(len(self.tags), n + size)
+            low = self.tags[start - 1] if start > 0 else self.tags[0] - size * TAG_GAP
+            high = self.tags[stop] if stop < len(self.tags) else self.tags[-1] + size * TAG_GAP
+            gap = (high - low) // (stop - start + 1)
+            if gap >= MIN_GAP:
+                break
+            size *= 2
+        old = self.tags[start:stop]
+        new = range(low + gap, low + gap * (len(old) + 1), gap)
+        if self.hashes or self.sorted:
+            rows = [self.data[i if i < n else i + 1] for i in range(start, stop)]
+            for column, index in self.hashes.items():
+                for row, old_tag, new_tag in zip(rows, old, new):
+                    tags = index[value_key(self.cell(row, column))]
+                    tags.discard(old_tag)
+                    tags.add(new_tag)
+            for (column, key), index in self.sorted.items():
+                # Every place is found before any changes, the index is only sorted again once all have
+                places = [bisect_left(index, (key(self.cell(row, column)), tag)) for row, tag in zip(rows, old)]
+                for place, tag in zip(places, new):
+                    index[place] = (index[place][0], tag)
+        for i, tag in zip(range(start, stop), new):
+            self.tags[i] = tag
+
+    def delete(self, n, row):
+        """Unindexes a row just deleted from position n."""
+        self.remove(self.tags[n], row)
+        del self.tags[n]
+
+    def update(self, n, old_row, row):
+        """Reindexes the row just replaced at position n."""
+        self.remove(self.tags[n], old_row)
+        self.add(self.tags[n], row)
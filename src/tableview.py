@@ -0,0 +1,122 @@
+'''
+Created on Oct 18, 2026
+
+A listbox that only renders the rows
+visible in its viewport.
+
+@author: Philip Deck
+'''
+from tkinter import Frame, Listbox, Scrollbar, END, LEFT, RIGHT, BOTH, Y
+from tkinter.font import Font
+
+
+class TableView(Frame):
+    '''Shows any sized list of rows by rendering only the visible ones.'''
+
+    def __init__(self, master, **options):
+        '''Constructor'''
+        super().__init__(master)
+
+        self.data = list()  # Any sequence of rows that supports len() and slicing
+        self.offset = 0  # Index of the first visible row
+        self.selected = None  # Index of the selected row in data
+
+        self.listbox = Listbox(self, exportselection=False, **options)
+        self.scrollbar = Scrollbar(self, command=self.yview)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+        self.listbox.pack(side=LEFT, fill=BOTH, expand=1)
+
+        self.line_height = Font(font=self.listbox.cget("font")).metrics("linespace") + 1
+
+        self.listbox.bind("<Configure>", lambda event: self.refresh())
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        self.listbox.bind("<MouseWheel>", lambda event: self.scroll(-3 * event.delta // 120))  # Windows and macOS
+        self.listbox.bind("<Button-4>", lambda event: self.scroll(-3))  # X11 wheel up
+        self.listbox.bind("<Button-5>", lambda event: self.scroll(3))  # X11 wheel down
+        self.listbox.bind("<Up>", lambda event: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda event: self.move_selection(1))
+        self.listbox.bind("<Prior>", lambda event: self.move_selection(-self.visible_rows()))
+        self.listbox.bind("<Next>", lambda event: self.move_selection(self.visible_rows()))
+
+    def set_data(self, data):
+        """Shows a new list of rows from the top."""
+        self.data = data
+        self.offset = 0
+        self.selected = None
+        self.refresh()
+
+    def size(self):
+        """Returns the number of rows, visible or not."""
+        return len(self.data)
+
+    def curselection(self):
+        """Returns the selected row index in data, like Listbox.curselection."""
+        if self.selected is not None and self.selected < len(self.data):
+            return (self.selected,)
+        return ()
+
+    def visible_rows(self):
+        """Returns how many rows fit in the viewport."""
+        height = self.listbox.winfo_height()
+        if height <= 1:  # Not drawn yet
+            return int(self.listbox.cget("height"))
+        return max(1, height // self.line_height)
+
+    def refresh(self):
+        """Renders the rows currently in the viewport."""
+        visible = self.visible_rows()
+        self.offset = max(0, min(self.offset, len(self.data) - visible))
+
+        self.listbox.delete(0, END)
+        rows = self.data[self.offset:self.offset + visible]
+        if rows:
+            self.listbox.insert(END, *rows)  # One round trip for the whole viewport
+
+        if self.selected is not None and self.offset <= self.selected < self.offset + visible:
+            self.listbox.selection_set(self.selected - self.offset)
+
+        if self.data:
+            self.scrollbar.set(self.offset / len(self.data), min(1, (self.offset + visible) / len(self.data)))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def yview(self, *args):
+        """Scrollbar callback, moves the viewport."""
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.data))
+            self.refresh()
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self.visible_rows()
+            self.scroll(step)
+
+    def scroll(self, step):
+        """Moves the viewport by step rows."""
+        self.offset += step
+        self.refresh()
+        return "break"
+
+    def see(self, index):
+        """Scrolls just enough to show the row at index."""
+        visible = self.visible_rows()
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + visible:
+            self.offset = index - visible + 1
+        self.refresh()
+
+    def on_select(self, event=None):
+        """Remembers the clicked row by its index in data."""
+        selection = self.listbox.curselection()
+        if selection:
+            self.selected = self.offset + selection[0]
+
+    def move_selection(self, step):
+        """Moves the selection with the keyboard, scrolling when needed."""
+        if not self.data:
+            return "break"
+        current = self.selected if self.selected is not None else self.offset
+        self.selected = max(0, min(current + step, len(self.data) - 1))
+        self.see(self.selected)
+        return "break"
@@ -5,8 +5,151 @@ Unit testing with pytest.
 
 @author: Philip Deck
 '''
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+import pytest
 import filesource
 import datasource
+import csvloader
+import columnstore
+import typeinfer
+import indexedreader
+import jsonloader
+import rowlist
+import searchindex
+import benchmark
+import checkpoint
+import cli
+import fileformat
+import metrics
+import asyncdatasource
+
+FAKE_COLUMNS = ['Ref_Date', 'GEO', 'Value']
+FAKE_ROWS = [('Jan-81', 'Canada', str(i)) for i in range(25)]
+
+
+class FakeCursor():
+    '''Stands in for a MySQLdb cursor, recording what is run on its connection.'''
+
+    def __init__(self, db, server_side):
+        self.db = db
+        self.server_side = server_side
+        self.closed = False
+        self.result = list()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, statement, params=None):
+        self.db.log.append(("execute", statement))
+        self.statement, self.params = statement, params
+        if "information_schema" in statement:
+            self.result = [(column, self.db.server.types.get(column, "varchar")) for column in FAKE_COLUMNS]
+        elif statement.startswith("LOAD DATA"):
+            with open(params[0], newline='', encoding='utf-8') as file:  # Counted as the server splits it
+                self.rowcount = file.read().count(params[1]) - 1
+        elif statement.startswith("select"):
+            self.db.server.fail("select")
+            self.result = list(FAKE_ROWS)
+        elif statement.startswith("SELECT COUNT(*)"):
+            self.result = [(self.db.server.rows,)]
+
+    def executemany(self, statement, rows):
+        self.db.server.fail("insert")
+        self.db.log.append(("executemany", [row[-1] for row in rows]))
+        self.db.pending += len(rows)
+        return len(rows)
+
+    def fetchone(self):
+        return self.result.pop(0) if self.result else None
+
+    def fetchall(self):
+        rows, self.result = self.result, list()
+        return rows
+
+    def fetchmany(self, size):
+        rows, self.result = self.result[:size], self.result[size:]
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection():
+    '''Stands in for a MySQLdb connection.'''
+
+    def __init__(self, server):
+        self.server = server
+        self.open = True
+        self.alive = True  # Pings fail once this is cleared
+        self.pings = 0
+        self.pending = 0  # Rows inserted since the last commit or rollback
+        self.log = list()
+        self.cursors = list()
+
+    def cursor(self, cursor_class=None):
+        self.cursors.append(FakeCursor(self, cursor_class is not None))
+        return self.cursors[-1]
+
+    def commit(self):
+        self.log.append(("commit",))
+        with self.server.lock:
+            self.server.rows += self.pending
+        self.pending = 0
+        self.server.fail("commit")  # After committing, like a connection lost before the server's reply
+
+    def rollback(self):
+        self.log.append(("rollback",))
+        self.pending = 0
+
+    def ping(self):
+        self.pings += 1
+        if not self.alive:
+            raise datasource.OperationalError("MySQL server has gone away")
+
+    def close(self):
+        self.open = False
+
+
+class FakeServer(list):
+    '''The connections opened to the fake MySQLdb, and the rows committed to the table behind them.'''
+
+    def __init__(self):
+        super().__init__()
+        self.rows = 0
+        self.types = dict()  # information_schema data type of the columns that aren't varchar
+        self.failures = list()  # "select", "insert" or "commit" for each coming OperationalError, in order
+        self.lock = threading.Lock()
+
+    def connect(self, **kwargs):
+        self.append(FakeConnection(self))
+        return self[-1]
+
+    def fail(self, step):
+        """Raises the next injected failure when it is for this step."""
+        with self.lock:
+            if not self.failures or self.failures[0] != step:
+                return
+            self.failures.pop(0)
+        raise datasource.OperationalError("Lost connection to MySQL server during query")
+
+
+@pytest.fixture
+def fake_mysql(monkeypatch):
+    """Puts a fake MySQLdb behind datasource, returns the FakeServer it connects to."""
+    server = FakeServer()
+    monkeypatch.setattr(datasource, "_driver", types.SimpleNamespace(connect=server.connect,
+                                                                     cursors=types.SimpleNamespace(SSCursor=object)))
+    monkeypatch.setattr(datasource, "_pools", dict())
+    return server
 
 
 def test_filesource_loadata():
@@ -71,4 +214,535 @@ def test_datasource_export():
     db.insert_records_into_table(data)
     data = db.get_all_records()
     assert data[0] == ['Jan-81', 'Canada', 'Meat, fish and dairy products', 'v1574569', 1.1, '60.9']
-    assert header == ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value']
\ No newline at end of file
+    assert header == ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value']
+
+
+def test_filesource_iter_rows(tmp_path):
+    '''Test streaming rows from a file in batches'''
+    path = str(tmp_path / "stream.csv")
+    rows = [['Jan-81', 'Canada', 'Meat, fish and dairy products', 'v1574569', '1.1', str(i)] for i in range(25)]
+    file = filesource.FileSource(path)
+    file.save_file(rows, ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value'])
+
+    batches = file.iter_rows(batch_size=10)
+    assert next(batches) == ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value']
+    batches = list(batches)
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [line for batch in batches for line in batch] == rows
+
+
+def test_datasource_select_statement(monkeypatch):
+    '''Test that filters, ordering and limits are compiled into parameterized SQL'''
+    source = datasource.DataSource("localhost", "phil", "1473", "cst8333", "PythonDataset")
+    monkeypatch.setattr(source, "get_headers", lambda: ['Ref_Date', 'GEO', 'Value'])
+    statement, params = source.select_statement(['GEO', 'Value'],
+                                                [('GEO', 'starts with', 'Can_'), ('Value', '>', '60')],
+                                                [('Value', 'desc')], 10, 5)
+    assert statement == ("select `GEO`, `Value` from PythonDataset where `GEO` like %s and `Value` > %s"
+                         " order by `Value` desc limit %s offset %s;")
+    assert params == ['Can\\_%', '60', 10, 5]
+    assert source.select_statement() == ("select * from PythonDataset;", [])
+    with pytest.raises(ValueError):
+        source.select_statement(filters=[('GEO = 1 or 1', '=', '1')])
+
+
+def test_csvloader_bulk_load(tmp_path, fake_mysql):
+    '''Test LOAD DATA LOCAL INFILE export, straight from the file and spooled after an edit'''
+    path = str(tmp_path / "bulk.csv")
+    with open(path, 'w', newline='', encoding='utf-8') as file:  # Written on Windows
+        file.write("Ref_Date,GEO,Value\r\nJan-81,Canada,60.9\r\nFeb-81,Canada,\r\nMar-81,Canada,61.2\r\n")
+    fake_mysql.types = {"Value": "decimal"}
+
+    loader = csvloader.CSVLoader()
+    loader.create_connection("localhost", "phil", "1473", "cst8333", "TestPythonDataset")
+    loader.set_file(path)
+    loader.load_data_from_file()
+    assert loader.bulk_load_into_table() == 3
+    load = fake_mysql[-1].cursors[-1]
+    assert load.params == (path, "\r\n")  # The file as it is, with its own line endings
+    assert load.statement.endswith("LINES TERMINATED BY %s IGNORE 1 LINES (Ref_Date,GEO,@field2)"
+                                   " SET Value = NULLIF(@field2, '');")
+
+    loader.delete_row(0)
+    assert loader.bulk_load_into_table() == 2
+    load = fake_mysql[-1].cursors[-1]
+    assert load.params[0] != path and load.params[1] == "\n"  # Spooled, the way FileSource writes
+    assert not os.path.exists(load.params[0])
+
+
+def test_csvloader_parallel_export(fake_mysql):
+    '''Test a partitioned export over several connections adds every row once'''
+    loader = csvloader.CSVLoader()
+    loader.create_connection("localhost", "phil", "1473", "cst8333", "TestPythonDataset")
+    loader.header = ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value']
+    loader.data = rowlist.RowList([['Jan-81', 'Canada', 'Meat, fish and dairy products', 'v1574569', str(i), '60.9']
+                                   for i in range(25000)])
+    loader.create_table()
+    loader.parallel = 3
+    loader.batch_size = 1000
+    report = loader.insert_records_into_table()
+    assert report["inserted"] == report["sent"] == fake_mysql.rows == 25000
+    assert report["consistent"] and not report["failed"]
+
+
+def test_csvloader_transfer(tmp_path):
+    '''Test streaming a file into another file without loading the data'''
+    source = filesource.FileSource(str(tmp_path / "source.csv"))
+    rows = [['Jan-81', 'Canada', 'Meat, fish and dairy products', 'v1574569', '1.1', str(i)] for i in range(25)]
+    source.save_file(rows, ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value'])
+    sink = filesource.FileSource(str(tmp_path / "sink.csv"))
+
+    loader = csvloader.CSVLoader()
+    loader.batch_size = 10
+    assert loader.transfer(source, sink) == 25
+    assert loader.data == []
+    assert sink.load_data() == source.load_data()
+
+
+def test_columnstore_roundtrip():
+    '''Test that columnar storage gives back the exact rows it was given'''
+    rows = [['Jan-81', 'Canada', 'Meat, fish and dairy products', 'v1574569', '1.1', '60.9'],
+            ['Feb-81', 'Canada', 'Meat, fish and dairy products', 'v1574569', '1.10', '61']] * 3
+    store = columnstore.ColumnStore(6)
+    store.extend(rows)
+    assert list(store) == rows
+    assert store[1:3] == rows[1:3]
+
+    store.insert(1, ['Mar-81', 'Ontario', 'Fruits', 'v1', '2', 'x'])
+    del store[0]
+    assert store[0] == ['Mar-81', 'Ontario', 'Fruits', 'v1', '2', 'x']
+    assert len(store) == 6
+
+
+def test_rowlist_matches_list():
+    '''Test that positional edits on a RowList give the same rows as on a list'''
+    expected = [[str(i)] for i in range(3000)]
+    rows = rowlist.RowList(expected)
+    for n in (0, 1500, 2999, 700, 3000):
+        rows.insert(n, ['new', str(n)])
+        expected.insert(n, ['new', str(n)])
+    for n in (0, 2000, -1, 512):
+        del rows[n]
+        del expected[n]
+    rows[1000] = ['edited']
+    expected[1000] = ['edited']
+    assert len(rows) == len(expected)
+    assert rows == expected
+    assert rows[-1] == expected[-1]
+    assert rows[1020:1040] == expected[1020:1040]
+    assert rows[::500] == expected[::500]
+
+
+def test_csvloader_filter_rows():
+    '''Test that filters use the indexes and keep up with row edits'''
+    loader = csvloader.CSVLoader()
+    loader.header = ['GEO', 'Value']
+    loader.data = rowlist.RowList([['Canada', '60.9'], ['Ontario', '61'], ['Quebec', '9.5'], ['Canada', '']])
+    assert list(loader.filter_rows(('GEO', '=', 'Canada'))) == [['Canada', '60.9'], ['Canada', '']]
+    assert list(loader.filter_rows(('Value', '>', '10'))) == [['Canada', '60.9'], ['Ontario', '61']]
+    assert list(loader.filter_rows(('GEO', 'starts with', 'Ont'), ('Value', '>=', '61.0'))) == [['Ontario', '61']]
+
+    loader.insert_row(0, ['Canada', '70'])
+    loader.delete_row(2)
+    loader.update_row(2, ['Canada', '8'])
+    assert list(loader.filter_rows(('GEO', '=', 'Canada'))) == [['Canada', '70'], ['Canada', '60.9'],
+                                                                 ['Canada', '8'], ['Canada', '']]
+    assert loader.filter_rows(('Value', '<', '10'))[:] == [['Canada', '8']]
+    assert searchindex.value_key('60.90') == searchindex.value_key('60.9')
+
+
+def test_typeinfer_statcan_columns():
+    '''Test type inference on rows shaped like the StatCan sample'''
+    rows = [['Jan-81', 'Canada', 'Meat, fish and dairy products', 'v1574569', '1.1', '60.9'],
+            ['Feb-81', 'Canada', 'Meat, fish and dairy products', 'v1574569', '1.10', '']]
+    # '1.1' and '1.10' are different Coordinates, as DECIMAL they would both become 1.10
+    assert typeinfer.infer_types(rows, 6) == ['VARCHAR(16)', 'VARCHAR(16)', 'VARCHAR(32)', 'VARCHAR(16)',
+                                              'VARCHAR(16)', 'DECIMAL(5,1)']
+    assert typeinfer.infer_types(rows, 6, complete=False) == ['VARCHAR(255)', 'VARCHAR(255)', 'VARCHAR(255)',
+                                                              'VARCHAR(255)', 'VARCHAR(255)', 'DOUBLE']
+    assert typeinfer.infer_types([['5'], ['-12']], 1, complete=False) == ['BIGINT']
+    convert = typeinfer.converters(['varchar', 'decimal'])
+    assert list(typeinfer.convert_rows([['v1', '']], convert)) == [['v1', None]]
+
+    loader = csvloader.CSVLoader()
+    loader.header = ['Vector', 'Value']
+    loader.data = rowlist.RowList([['v1', '60.9']] * 30000)
+    loader.data[12346] = ['v1', '1.234']  # Left out of the sample, MySQL would round it to 1.2
+    assert loader.infer_types() == ['VARCHAR(16)', 'DECIMAL(7,3)']
+    loader.data = rowlist.RowList([['v1', '5']] * 30000)
+    loader.data[12346] = ['a much longer vector name here', '3000000000']  # Every row counts, not only a sample
+    assert loader.infer_types() == ['VARCHAR(32)', 'BIGINT']
+
+
+def test_benchmark_rows_match_sample():
+    '''Test that benchmark data is shaped like the StatCan sample'''
+    rows = list(benchmark.generate_rows(200))
+    assert rows[0][:5] == ['Jan-81', 'Canada', 'Meat, fish and dairy products', 'v1574569', '1.1']
+    assert all(len(row) == len(benchmark.HEADER) for row in rows)
+    assert rows == list(benchmark.generate_rows(200))
+
+
+def test_filesource_parallel_matches(tmp_path):
+    '''Test that parsing in a process pool gives the same rows as a single reader'''
+    path = str(tmp_path / "parallel.csv")
+    rows = [['Jan-81', 'Canada', 'Meat, fish\nand "dairy" products', 'v1574569', '1.1', str(i)] for i in range(5000)]
+    filesource.FileSource(path).save_file(rows, ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value'])
+
+    file = filesource.FileSource(path, processes=2)
+    ranges = list(file.iter_ranges(part_size=4096))
+    assert len(ranges) > 2
+    assert [line for lines in ranges for line in lines][1:] == rows
+    assert file.load_data() == filesource.FileSource(path).load_data()
+
+    with open(path, 'w', encoding='utf-8') as out:  # A stray quote in an unquoted field throws off quote parity
+        out.write('Id,Name,Flag\n1,5" pipe,x\n')
+        out.writelines(str(i) + ',"multi\nline",y\n' for i in range(2, 500))
+    ranges = list(filesource.FileSource(path, processes=2).iter_ranges(part_size=4096))
+    assert [line for lines in ranges for line in lines][1:] == filesource.FileSource(path).load_data()[1]
+    assert filesource.FileSource(path, processes=2).load_data() == filesource.FileSource(path).load_data()
+
+
+def test_indexedreader_random_access(tmp_path):
+    '''Test random access through the row offset index, and reusing the saved index'''
+    path = str(tmp_path / "indexed.csv")
+    rows = [['Jan-81', 'Canada', 'Meat, fish\nand "dairy" products', 'v1574569', '1.1', str(i)] for i in range(100)]
+    filesource.FileSource(path).save_file(rows, ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value'])
+
+    reader = indexedreader.IndexedReader(path)
+    assert reader.header == ['Ref_Date', 'GEO', 'COMMOD', 'Vector', 'Coordinate', 'Value']
+    assert len(reader) == 100
+    assert reader[42] == rows[42]
+    assert reader[-1] == rows[-1]
+    assert reader[10:20] == rows[10:20]
+    reader.close()
+
+    reopened = indexedreader.IndexedReader(path)
+    assert reopened.offsets == reader.offsets
+    assert list(reopened) == rows
+
+
+def test_csvloader_save_cancelled(tmp_path):
+    '''Test that a save stopped partway leaves the file that was there before'''
+    path = str(tmp_path / "saved.csv")
+    filesource.FileSource(path).save_file([['Jan-81', 'Canada', '1.1']], ['Ref_Date', 'GEO', 'Value'])
+    loader = csvloader.CSVLoader()
+    loader.header = ['Ref_Date', 'GEO', 'Value']
+    loader.data = rowlist.RowList([['Feb-81', 'Canada', str(i)] for i in range(50)])
+    loader.batch_size = 10
+
+    def cancel(rows):
+        if rows >= 20:
+            raise RuntimeError("Cancelled")
+    with pytest.raises(RuntimeError):
+        loader.save_file(path, cancel)
+    assert filesource.FileSource(path).load_data() == (['Ref_Date', 'GEO', 'Value'], [['Jan-81', 'Canada', '1.1']])
+    assert os.listdir(str(tmp_path)) == ["saved.csv"]
+    loader.save_file(path)
+    assert len(filesource.FileSource(path).load_data()[1]) == 50
+
+
+def test_csvloader_change_tracking():
+    '''Test that edits are recorded as a net change log'''
+    loader = csvloader.CSVLoader()
+    loader.data = [['Jan-81', 'Canada', '1.1'], ['Feb-81', 'Canada', '1.2'], ['Mar-81', 'Canada', '1.3']]
+    loader.update_row(0, ['Jan-81', 'Canada', '9.9'])
+    loader.update_row(0, ['Jan-81', 'Ontario', '9.9'])
+    loader.delete_row(1)
+    loader.insert_row(0, ['Apr-81', 'Canada', '1.4'])
+    loader.delete_row(0)
+    assert loader.changes.updates() == [(('Jan-81', 'Canada', '1.1'), ('Jan-81', 'Ontario', '9.9'))]
+    assert dict(loader.changes.deleted) == {('Feb-81', 'Canada', '1.2'): 1}
+    assert not loader.changes.inserted
+    assert len(loader.changes) == 2
+
+
+def test_csvloader_recent_snapshot(tmp_path):
+    '''Test that a recent import is reloaded from its snapshot until the file changes'''
+    path = tmp_path / "recent.csv"
+    path.write_text("a,b\n1,x\n2,y\n", encoding='utf-8')
+    recent = jsonloader.JSONLoader(str(tmp_path / "recent.json"), str(tmp_path / "snapshots"))
+    loader = csvloader.CSVLoader()
+    loader.set_file(str(path))
+    assert not loader.import_recent(recent, "file")
+    assert not loader.import_recent(recent, "file")  # Only listed until snapshots are turned on
+    assert not os.path.exists(recent.snapshot_path(recent.entries[0]["source"]))
+    loader.snapshots = True
+    assert not loader.import_recent(recent, "file")
+    assert loader.import_recent(recent, "file")
+    assert loader.header == ['a', 'b'] and loader.data == [['1', 'x'], ['2', 'y']]
+    assert jsonloader.JSONLoader(str(tmp_path / "recent.json")).entries[0]["source"]["file_name"] == str(path)
+
+    path.write_text("a,b\n3,z\n", encoding='utf-8')
+    assert not loader.import_recent(recent, "file")
+    assert loader.data == [['3', 'z']]
+
+    recent.max_bytes = 10  # Smaller than the snapshot would be, so it isn't written
+    path.write_text("a,b\n4,w\n", encoding='utf-8')
+    assert not loader.import_recent(recent, "file")
+    assert not loader.import_recent(recent, "file")
+    assert not os.path.exists(recent.snapshot_path(recent.entries[0]["source"]))
+
+
+def test_metrics_spans_and_counts(tmp_path):
+    '''Test that file parsing reports its spans and counters only while a sink listens'''
+    path = tmp_path / "metrics.csv"
+    path.write_text("a,b\n1,x\n2,y\n", encoding='utf-8')
+    assert metrics.span("file.parse") is metrics.NO_SPAN
+
+    totals = metrics.Totals()
+    metrics.add_sink(totals)
+    try:
+        filesource.FileSource(str(path)).load_data()
+    finally:
+        metrics.remove_sink(totals)
+    snapshot = totals.snapshot()
+    assert snapshot["counts"]["file.rows"] == 2
+    assert snapshot["counts"]["file.bytes"] == path.stat().st_size
+    assert snapshot["spans"]["file.parse"]["calls"] == 1
+    assert not metrics.enabled()
+
+
+def test_filesource_formats_round_trip(tmp_path):
+    '''Test that compressed and columnar files give back the rows a plain csv file does'''
+    header = ['Ref_Date', 'GEO', 'Vector', 'Value', 'Note']
+    rows = [[date, geo, 'v' + str(i), value, note] for i, (date, geo, value, note) in enumerate(
+        [('Jan-81', 'Canada', '60.9', ''), ('Feb-81', 'Ontario', '007', 'line\nbreak'),
+         ('Mar-81', 'Canada', '-3', 'a "quote", and comma'), ('Apr-81', 'Quebec', '1e3', 'nul\x00byte')] * 50)]
+    plain = filesource.FileSource(str(tmp_path / "plain.csv"))
+    plain.save_file(rows, header)
+    expected = plain.load_data()
+
+    for name in ("rows.csv.gz", "rows.csv.zst", "rows.csvcol"):
+        if name.endswith(".zst") and fileformat.zstd() is None:
+            continue
+        source = filesource.FileSource(str(tmp_path / name))
+        source.save_file(rows, header)
+        assert source.load_data() == expected
+        batches = list(source.iter_rows(64))
+        assert batches[0] == header and [row for batch in batches[1:] for row in batch] == expected[1]
+    assert fileformat.format_of("export.CSV.GZ") == "csv.gz"
+
+    columnar = filesource.FileSource(str(tmp_path / "uneven.csvcol"))
+    with pytest.raises(ValueError):
+        columnar.save_file([['a', 'b'], ['c']], ['x', 'y'])
+
+
+def test_csvloader_export_import_several(tmp_path, fake_mysql):
+    '''Test copying several files into their own tables at once and back out again'''
+    paths = list()
+    for n in range(3):
+        source = filesource.FileSource(str(tmp_path / ("Test Python Dataset " + str(n) + ".csv")))
+        source.save_file([['Jan-81', 'Canada', str(i)] for i in range(100 * (n + 1))], FAKE_COLUMNS)
+        paths.append(source.file_name)
+    loader = csvloader.CSVLoader()
+    loader.create_connection("localhost", "phil", "1473", "cst8333", "TestPythonDataset")
+    loader.batch_size = 50
+    counts = loader.export_files(paths, create_table=True, concurrency=2)
+    assert counts == {path: 100 * (n + 1) for n, path in enumerate(paths)}
+    assert fake_mysql.rows == 600
+    created = [entry[1] for db in fake_mysql for entry in db.log
+               if entry[0] == "execute" and entry[1].startswith("CREATE")]
+    assert sorted(statement.split("(")[0] for statement in created) == [
+        "CREATE TABLE Test_Python_Dataset_0", "CREATE TABLE Test_Python_Dataset_1", "CREATE TABLE Test_Python_Dataset_2"]
+
+    tables = [csvloader.table_name_for(path) for path in paths]
+    fake_mysql.failures = ["select"]  # One table can't be read, the others still are
+    counts = loader.import_tables(tables, str(tmp_path), ".csvcol", concurrency=2)
+    assert sorted(count for count in counts.values() if not isinstance(count, Exception)) == [25, 25]
+    failed = [table for table, count in counts.items() if isinstance(count, Exception)]
+    assert len(failed) == 1 and not os.path.exists(str(tmp_path / (failed[0] + ".csvcol")))
+    read = [table for table in tables if table not in failed]
+    assert filesource.FileSource(str(tmp_path / (read[0] + ".csvcol"))).load_data() == (
+        FAKE_COLUMNS, [list(row) for row in FAKE_ROWS])
+
+
+def test_asyncdatasource_runs_on_any_loop():
+    '''Test that several event loops, on a thread of their own, can run more calls than the concurrency'''
+    source = asyncdatasource.AsyncDataSource("localhost", "phil", "1473", "cst8333", concurrency=2)
+    results = list()
+
+    def run_twice():
+        for _ in range(2):
+            jobs = {n: source.run(time.sleep, 0.01) for n in range(5)}
+            results.append(asyncio.run(source.gather(jobs)))
+
+    worker = threading.Thread(target=run_twice)  # Like BackgroundJob, there is no event loop set up there
+    worker.start()
+    worker.join()
+    assert results == [{n: None for n in range(5)}] * 2
+
+
+def test_cli_csv2csv(tmp_path, capsys):
+    '''Test the command line rewriting a csv file into another format without Tk'''
+    source = filesource.FileSource(str(tmp_path / "source.csv"))
+    rows = [['Jan-81', 'Canada', '1.1', str(i)] for i in range(25)]
+    source.save_file(rows, ['Ref_Date', 'GEO', 'Coordinate', 'Value'])
+    target = str(tmp_path / "target.csv.gz")
+    assert cli.main(["csv2csv", source.file_name, target, "--stream", "--batch-size", "10"]) == 0
+    assert "25 rows" in capsys.readouterr().out
+    assert filesource.FileSource(target).load_data() == (['Ref_Date', 'GEO', 'Coordinate', 'Value'], rows)
+    assert not os.path.exists(source.file_name + ".idx")  # Streamed, not indexed
+    assert cli.main(["csv2csv", str(tmp_path / "missing.csv"), target]) == 1
+    assert "tkinter" not in sys.modules
+
+
+def test_startup_defers_imports():
+    '''Test that starting the GUI doesn't load the MySQL driver, asyncio or the Tk dialogs'''
+    deferred = ['MySQLdb', 'asyncio', 'tempfile', 'tkinter.filedialog', 'tkinter.messagebox']
+    loaded = subprocess.run([sys.executable, "-c", "import sys, window; print([name for name in " + repr(deferred)
+                             + " if name in sys.modules])"], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    assert loaded == "[]"
+
+
+def test_checkpoint_settle(tmp_path):
+    '''Test that a checkpoint resumes only its own export and settles a cut off commit from the row count'''
+    path = str(tmp_path / "checkpoint.json")
+    point = checkpoint.Checkpoint(path, {"file_name": "big.csv", "size": 10}, {"table_name": "Dataset"})
+    point.table_rows = 5
+    point.begin(100)
+    point.commit()
+    point.begin(100)  # Cut off here, the commit may or may not have landed
+
+    resumed = checkpoint.Checkpoint(path, {"file_name": "big.csv", "size": 10}, {"table_name": "Dataset"})
+    assert (resumed.rows, resumed.table_rows, resumed.pending) == (100, 105, 100)
+    assert not resumed.settle(105)
+    assert (resumed.rows, resumed.pending) == (100, None)
+    resumed.begin(100)
+    assert resumed.settle(205)
+    assert (resumed.rows, resumed.table_rows) == (200, 205)
+    with pytest.raises(ValueError):
+        resumed.settle(250)
+
+    assert not checkpoint.Checkpoint(path, {"file_name": "other.csv", "size": 10}, {"table_name": "Dataset"}).started()
+    resumed.clear()
+    assert not checkpoint.Checkpoint(path, {"file_name": "big.csv", "size": 10}, {"table_name": "Dataset"}).started()
+
+
+def test_searchindex_repeated_inserts():
+    '''Test that inserting over and over at one spot keeps the built indexes up to date instead of dropping them'''
+    rows = rowlist.RowList([[str(i % 7), str(i)] for i in range(1000)])
+    expected = list(rows)
+    index = searchindex.RowIndex(rows)
+    index.search([(0, '=', '3'), (1, '>', '500')])
+    built = (index.hashes[0], index.sorted[1, searchindex.value_key])
+    for i in range(200):
+        row = [str(i % 7), str(2000 + i)]
+        rows.insert(500, row)
+        expected.insert(500, row)
+        index.insert(500, row)
+    assert (index.hashes[0], index.sorted[1, searchindex.value_key]) == built
+    assert list(index.tags) == sorted(set(index.tags))
+    assert list(index.search([(0, '=', '3')])) == [row for row in expected if row[0] == '3']
+    assert list(index.search([(1, '>', '500')])) == [row for row in expected if int(row[1]) > 500]
+
+
+def test_datasource_insert_commits_chunks(fake_mysql):
+    '''Test that batches are inserted and committed chunk_size rows at a time, whatever the batch sizes'''
+    source = datasource.DataSource("localhost", "phil", "1473", "cst8333", "TestPythonDataset")
+    rows = [list(row) for row in FAKE_ROWS]
+    committed = list()
+    assert source.insert_batches([rows[:7], rows[7:18], rows[18:]], 10, committed.append) == 25
+    assert len(fake_mysql) == 1
+    writes = [entry for entry in fake_mysql[0].log if entry[0] in ("executemany", "commit")]
+    assert writes == [("executemany", [str(i) for i in range(10)]), ("commit",),
+                      ("executemany", [str(i) for i in range(10, 20)]), ("commit",),
+                      ("executemany", [str(i) for i in range(20, 25)]), ("commit",)]
+    assert committed == [10, 20, 25]
+    assert source.insert_records_into_table(rows, 100) == 25
+
+
+def test_connection_pool_reuses_and_replaces(fake_mysql):
+    '''Test that idle connections are reused, pinged once they idle past ping_after and replaced when dead'''
+    pool = datasource.get_pool("localhost", "phil", "1473", "cst8333")
+    with pool.connection() as db:
+        pass
+    with pool.connection() as again:
+        assert again is db
+    assert db.pings == 0  # Recently used, no need to check it
+    pool.idle[0] = (db, time.time() - pool.ping_after - 1)
+    with pool.connection() as again:
+        assert again is db
+    assert db.pings == 1
+    db.alive = False
+    pool.idle[0] = (db, time.time() - pool.ping_after - 1)
+    with pool.connection() as fresh:
+        assert fresh is not db
+    assert not db.open and len(fake_mysql) == 2
+    pool.max_idle = 1
+    first, second = pool.acquire(), pool.acquire()
+    assert first is fresh
+    pool.release(first)
+    pool.release(second)
+    assert pool.idle[0][0] is first and len(pool.idle) == 1 and not second.open
+
+
+def test_datasource_iter_records_closes_cursor(fake_mysql, monkeypatch):
+    '''Test that records stream in batches from a server-side cursor that is closed when the caller stops early'''
+    source = datasource.DataSource("localhost", "phil", "1473", "cst8333", "TestPythonDataset")
+    batches = source.iter_records(batch_size=10)
+    assert len(next(batches)) == 10
+    batches.close()  # Stopping before the last batch
+    db = fake_mysql[0]
+    assert db.cursors[-1].server_side and db.cursors[-1].closed
+    assert source.db is None and source.pool.idle[0][0] is db
+    assert [len(batch) for batch in source.iter_records(batch_size=10)] == [10, 10, 5]
+    assert len(fake_mysql) == 1 and db.cursors[-1].closed
+
+    def refuse(**kwargs):
+        raise RuntimeError("Can't connect to MySQL server")
+    monkeypatch.setattr(datasource._driver, "connect", refuse)
+    monkeypatch.setattr(datasource, "_pools", dict())
+    with pytest.raises(RuntimeError):
+        next(datasource.DataSource("localhost", "phil", "1473", "cst8333", "TestPythonDataset").iter_records())
+
+
+def test_csvloader_transfer_sizes_sampled_types(tmp_path, fake_mysql):
+    '''Test that a table made from the first batch of a stream only takes the columns' kinds from it'''
+    source = filesource.FileSource(str(tmp_path / "source.csv"))
+    source.save_file([['v1', '5']] * 20 + [['a much longer vector name here', '3000000000']], ['Vector', 'Value'])
+    loader = csvloader.CSVLoader()
+    loader.batch_size = 10
+    sink = datasource.DataSource("localhost", "phil", "1473", "cst8333", "TestPythonDataset")
+    assert loader.transfer(source, sink, create_table=True) == 21
+    assert ("execute", "CREATE TABLE TestPythonDataset(Vector VARCHAR(255),Value BIGINT);") in fake_mysql[0].log
+
+
+def test_cli_csv2db(tmp_path, capsys, fake_mysql, monkeypatch):
+    '''Test streaming a file into a table from the command line, and a failed connection exiting with an error'''
+    source = filesource.FileSource(str(tmp_path / "source.csv"))
+    source.save_file([list(row) for row in FAKE_ROWS], FAKE_COLUMNS)
+    args = ["csv2db", source.file_name, "--user", "phil", "--password", "1473", "--schema", "cst8333",
+            "--table", "TestPythonDataset", "--stream", "--batch-size", "10"]
+    assert cli.main(args) == 0
+    assert "25 rows" in capsys.readouterr().out
+    assert [entry[1] for entry in fake_mysql[0].log if entry[0] == "executemany"] == [
+        [str(i) for i in range(0, 10)], [str(i) for i in range(10, 20)], [str(i) for i in range(20, 25)]]
+    assert not os.path.exists(source.file_name + ".idx")
+
+    def refuse(**kwargs):
+        raise datasource.OperationalError("Access denied for user 'phil'@'localhost'")
+    monkeypatch.setattr(datasource._driver, "connect", refuse)
+    monkeypatch.setattr(datasource, "_pools", dict())
+    assert cli.main(args) == 1
+    assert "csvloader: error: Access denied" in capsys.readouterr().err
+
+
+def test_datasource_partition_retries(fake_mysql):
+    '''Test that a partition failing while inserting is retried, and one failing at commit isn't inserted twice'''
+    source = datasource.DataSource("localhost", "phil", "1473", "cst8333", "TestPythonDataset")
+    rows = [list(row) for row in FAKE_ROWS[:24]]
+    fake_mysql.failures = ["insert"]
+    report = source.insert_partitions([rows], parallel=2, partition_size=8, chunk_size=4, retries=1)
+    assert (report["inserted"], report["retries"], report["failed"], report["in_doubt"]) == (24, 1, [], [])
+    assert report["consistent"] and fake_mysql.rows == 24
+
+    fake_mysql.failures = ["commit"]  # The server committed, the reply never came
+    report = source.insert_partitions([rows], parallel=2, partition_size=8, chunk_size=4, retries=1)
+    assert (report["inserted"], report["retries"], report["failed"], len(report["in_doubt"])) == (16, 0, [], 1)
+    assert report["consistent"] and fake_mysql.rows == 48
+
+    fake_mysql.failures = ["insert", "insert"]
+    report = source.insert_partitions([rows[:8]], parallel=1, partition_size=8, chunk_size=4, retries=1)
+    assert (report["inserted"], report["failed"]) == (0, [0])
+    assert report["consistent"] and fake_mysql.rows == 48
@@ -0,0 +1,200 @@
+'''
+Created on Oct 18, 2026
+
+Infers MySQL column types from sampled rows
+and converts values to match them.
+
+@author: Philip Deck
+'''
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+INTEGER = re.compile(r"-?(0|[1-9][0-9]*)\Z")  # No leading zeros, '007' stays text
+DECIMAL = re.compile(r"-?(0|[1-9][0-9]*)\.([0-9]+)\Z")
+DATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}\Z")
+
+INT_TYPES = ("tinyint", "smallint", "mediumint", "int", "integer", "bigint")
+DECIMAL_TYPES = ("decimal", "numeric")
+FLOAT_TYPES = ("float", "double", "real")
+TEXT_TYPES = ("char", "varchar", "tinytext", "text", "mediumtext", "longtext")
+
+
+class ColumnStats():
+    '''What has been seen of one column's values so far.'''
+
+    def __init__(self):
+        '''Constructor'''
+        self.kinds = set()  # 'int', 'decimal', 'float', 'date', 'datetime' or 'text'
+        self.low = 0  # Smallest integer
+        self.high = 0  # Largest integer
+        self.digits = 0  # Most digits before the decimal point
+        self.scale = 0  # Most digits after the decimal point
+        self.scales = set()  # Every number of digits after the decimal point seen
+        self.padded = False  # Whether a decimal ended in a zero after the point, like '1.10'
+        self.length = 0  # Longest value as text
+
+    def add(self, value):
+        """Records one value, empty strings and None are treated as NULL."""
+        if value is None or value == "":
+            return
+        if isinstance(value, str):
+            self.length = max(self.length, len(value))
+            if INTEGER.match(value):
+                self.add_int(int(value))
+            elif DECIMAL.match(value):
+                whole, fraction = value.lstrip("-").split(".")
+                self.padded = self.padded or fraction.endswith("0")
+                self.add_decimal(len(whole), len(fraction))
+            elif DATE.match(value) and valid_date(value):
+                self.kinds.add("date")
+            else:
+                self.kinds.add("text")
+        elif isinstance(value, bool):
+            self.add_int(int(value))
+        elif isinstance(value, int):
+            self.add_int(value)
+        elif isinstance(value, Decimal):
+            sign, digits, exponent = value.as_tuple()
+            scale = max(0, -exponent)
+            self.add_decimal(max(1, len(digits) - scale), scale)
+        elif isinstance(value, float):
+            self.kinds.add("float")
+        elif isinstance(value, datetime):
+            self.kinds.add("datetime")
+        elif isinstance(value, date):
+            self.kinds.add("date")
+        else:
+            self.length = max(self.length, len(str(value)))
+            self.kinds.add("text")
+
+    def add_int(self, number):
+        self.kinds.add("int")
+        self.scales.add(0)
+        self.low = min(self.low, number)
+        self.high = max(self.high, number)
+        self.digits = max(self.digits, len(str(abs(number))))
+
+    def add_decimal(self, digits, scale):
+        self.kinds.add("decimal")
+        self.digits = max(self.digits, digits)
+        self.scale = max(self.scale, scale)
+        self.scales.add(scale)
+
+    def sql_type(self, complete=True):
+        """Returns the narrowest MySQL type that holds every value seen.
+
+        complete says whether every value of the column was seen or only a
+        sample. MySQL silently rounds decimals with more digits after the
+        point than the column's scale and strict mode rejects values too
+        long or too large for the column, so a sampled column is only sized
+        to its kind: DOUBLE for numbers with decimals or past BIGINT,
+        BIGINT for integers and VARCHAR(255) for text. Numbers written with
+        different scales and trailing zeros, like '1.1' and '1.10', are
+        codes rather than amounts and stay text."""
+        kinds = self.kinds
+        if "decimal" in kinds and self.padded and len(self.scales) > 1:
+            kinds = {"text"}
+        if not kinds:
+            return "VARCHAR(255)"  # Nothing but NULLs, keep the old default
+        if kinds == {"int"}:
+            if complete and -2 ** 31 <= self.low and self.high < 2 ** 31:
+                return "INT"
+            if -2 ** 63 <= self.low and self.high < 2 ** 63:
+                return "BIGINT"
+            kinds = {"decimal"}
+        if complete and kinds <= {"int", "decimal"} and self.digits + self.scale <= 63 and self.scale <= 30:
+            # Two more whole digits than seen, for values that grow later
+            return "DECIMAL({0},{1})".format(self.digits + 2 + self.scale, self.scale)
+        if kinds <= {"int", "decimal", "float"}:
+            return "DOUBLE"
+        if kinds == {"date"}:
+            return "DATE"
+        if kinds <= {"date", "datetime"}:
+            return "DATETIME"
+        if self.length <= 255:
+            return "VARCHAR({0})".format(varchar_length(self.length) if complete else 255)
+        return "TEXT"
+
+
+def valid_date(value):
+    """Whether a YYYY-MM-DD string is a real calendar date."""
+    try:
+        date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+        return True
+    except ValueError:
+        return False
+
+
+def varchar_length(length):
+    """Rounds a text length up to a power of two, leaving room for unsampled rows."""
+    size = 16
+    while size < length:
+        size *= 2
+    return min(size, 255)
+
+
+def column_stats(rows, width):
+    """Returns the ColumnStats of each of the width columns in rows."""
+    stats = [ColumnStats() for _ in range(width)]
+    for row in rows:
+        for column, value in zip(stats, row):
+            column.add(value)
+    return stats
+
+
+def infer_types(rows, width, complete=True):
+    """Returns a MySQL type for each of the width columns in rows.
+
+    complete says whether rows are every row or only a sample, see
+    ColumnStats.sql_type."""
+    return [column.sql_type(complete) for column in column_stats(rows, width)]
+
+
+def converter(cast):
+    """Wraps cast so empty values become NULL and values it rejects pass through."""
+    def convert(value):
+        if value is None or value == "":
+            return None
+        if not isinstance(value, str):
+            return value
+        try:
+            return cast(value)
+        except (ValueError, InvalidOperation):
+            return value  # Let the server decide what to do with it
+    return convert
+
+
+def parse_date(value):
+    return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+def converters(data_types):
+    """Returns a converter per column for the table's information_schema data types.
+
+    Text columns get None, they take the values unchanged."""
+    result = list()
+    for data_type in data_types:
+        data_type = data_type.lower()
+        if data_type in INT_TYPES:
+            result.append(converter(int))
+        elif data_type in DECIMAL_TYPES:
+            result.append(converter(Decimal))
+        elif data_type in FLOAT_TYPES:
+            result.append(converter(float))
+        elif data_type == "date":
+            result.append(converter(parse_date))
+        elif data_type in TEXT_TYPES:
+            result.append(None)
+        else:
+            result.append(converter(str))  # Only turns empty values into NULL
+    return result
+
+
+def convert_rows(rows, column_converters):
+    """Yields rows with each value converted for its column."""
+    if not any(column_converters):
+        yield from rows
+        return
+    for row in rows:
+        yield [convert(value) if convert else value for convert, value in zip(column_converters, row)]
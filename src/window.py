@@ -8,40 +8,114 @@ and uses it to perform functions.
 @author: Philip Deck
 '''
 
-from tkinter import Tk, Toplevel, Label, Listbox, Entry, Menu, END, BOTTOM, BOTH, NORMAL, DISABLED
+from tkinter import (Tk, Toplevel, Frame, Label, Entry, Button, Menu, OptionMenu, BooleanVar, StringVar,
+                     END, TOP, BOTTOM, LEFT, BOTH, X, NORMAL, DISABLED)
 
+import logging
 import time
 import threading
+import checkpoint
 import csvloader
+import datasource
 import csvdialog
-from tkinter.filedialog import askopenfilename, asksaveasfilename
-from tkinter.messagebox import askyesno
+import jsonloader
+import searchindex
+import tableview
 import queue
 
+log = logging.getLogger(__name__)
+
+# Every format FileSource reads and writes, picked by extension
+FILE_TYPES = [('CSV files', '*.csv'), ('Compressed CSV files', '*.csv.gz *.csv.zst'),
+              ('Columnar files', '*.csvcol'), ('All files', '*')]
+
+
+def filedialog():
+    """tkinter.filedialog, imported the first time a file dialog is shown so startup doesn't pay for it."""
+    import tkinter.filedialog
+    return tkinter.filedialog
+
+
+def messagebox():
+    """tkinter.messagebox, imported the first time a message box is shown."""
+    import tkinter.messagebox
+    return tkinter.messagebox
+
+
+class JobCancelled(Exception):
+    '''Raised inside a background job once the user cancels it.'''
+
+
+class BackgroundJob():
+    '''A long running task on a worker thread that reports to the Tk loop through a queue.'''
+
+    def __init__(self, name, task, on_done, cancellable=True):
+        '''Constructor'''
+        self.name = name  # Shown to the user while the job runs
+        self.task = task  # Called on the worker thread with the progress callback
+        self.on_done = on_done  # Called on the Tk loop with the task's result
+        self.cancellable = cancellable  # Whether the task reports progress, it can only be stopped there
+        self.events = queue.Queue()  # (event, value) pairs for the Tk loop
+        self.cancelled = threading.Event()
+
+    def start(self):
+        """Starts the worker thread."""
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        """Runs the task and reports how it ended."""
+        try:
+            self.events.put(("done", self.task(self.progress)))
+        except JobCancelled:
+            self.events.put(("cancelled", None))
+        except Exception as err:
+            self.events.put(("error", err))
+
+    def progress(self, rows):
+        """Reports progress from the worker, stopping the task once cancelled."""
+        if self.cancelled.is_set():
+            raise JobCancelled()
+        self.events.put(("progress", rows))
+
+    def cancel(self):
+        """Cancels the task at its next progress report."""
+        self.cancelled.set()
+
 
 class Window(Tk):
     '''
     The graphical interface for the CSV Loader.
     '''
 
-    def __init__(self):
+    def __init__(self, started=None):
         '''
         Constructor
         '''
         super().__init__()  # Call the parent's constructor.
         
-        self.startime = time.time()  # Record the start time. (Used for uptime)
+        self.startime = started or time.time()  # Record the start time, the launcher's when given. (Used for uptime)
+        self.startup_time = None  # Seconds from the start time until the window was first shown.
         
         self.app = csvloader.CSVLoader()  # Start a session of the csvloader.
+        self.job = None  # The running BackgroundJob, only one at a time.
+        self.recent = jsonloader.JSONLoader()  # The recent imports and their snapshots.
+        self.filtered = False  # Whether the listbox shows only the rows matching the filter bar.
         self.build()  # Build the scene.
+        self.after_idle(self.started)  # Runs once the window is up.
+
+    def started(self):
+        """Records how long the window took to show up."""
+        self.startup_time = time.time() - self.startime
+        log.info("Window ready in %.3f seconds.", self.startup_time)
 
     def build(self):
         """Builds the main scene for the window."""
         self.title("CSV Loader - Philip Deck")
         
         self.build_menu()  # Build the menu bar.
+        self.build_filterbar()  # Build the filter bar above the rows.
         
-        self.listbox = Listbox(self, width=120, height=20)  # The container for the data.
+        self.listbox = tableview.TableView(self, width=120, height=20)  # The container for the data.
         self.listbox.pack(padx=5, pady=5, fill=BOTH, expand=1)  # Place it in the middle.
         
         self.infobox = Entry(self)  # Displays useful information to the user.
@@ -49,6 +123,60 @@ class Window(Tk):
         
         self.set_infobox_msg("CSV Loader - Philip Deck")
         
+    def build_filterbar(self):
+        """Builds the bar used to narrow the listbox down to matching rows."""
+        filterbar = Frame(self)
+        
+        Label(filterbar, text="Filter:").pack(side=LEFT)
+        self.filter_column = StringVar(self)
+        self.column_menu = OptionMenu(filterbar, self.filter_column, "")  # Filled with the header once loaded
+        self.column_menu.pack(side=LEFT)
+        self.filter_op = StringVar(self, value=searchindex.OPERATORS[0])
+        OptionMenu(filterbar, self.filter_op, *searchindex.OPERATORS).pack(side=LEFT)
+        self.filter_value = Entry(filterbar, width=40)
+        self.filter_value.pack(side=LEFT, padx=5, fill=X, expand=1)
+        self.filter_value.bind("<Return>", lambda event: self.apply_filter())
+        Button(filterbar, text="Apply", command=self.apply_filter).pack(side=LEFT)
+        Button(filterbar, text="Clear", command=self.clear_filter).pack(side=LEFT, padx=5)
+        
+        filterbar.pack(side=TOP, padx=5, pady=(5, 0), fill=X)
+
+    def update_filter_columns(self):
+        """Offers the loaded header's columns in the filter bar."""
+        menu = self.column_menu["menu"]
+        menu.delete(0, END)
+        for column in self.app.header:
+            menu.add_command(label=column, command=lambda column=column: self.filter_column.set(column))
+        if self.filter_column.get() not in self.app.header:
+            self.filter_column.set(self.app.header[0] if self.app.header else "")
+
+    def apply_filter(self):
+        """Shows only the rows matching the filter bar, searched through the column indexes."""
+        condition = (self.filter_column.get(), self.filter_op.get(), self.filter_value.get())
+        if not condition[0] or self.job_running():
+            return
+        
+        def done(rows):
+            self.listbox.set_data(rows)
+            self.filtered = True
+            self.set_infobox_msg("Showing " + str(len(rows)) + " of " + str(len(self.app.data)) + " rows where "
+                                 + " ".join(condition) + ". Clear the filter to edit rows.")
+
+        self.run_job("Filtering", lambda progress: self.app.filter_rows(condition), done, cancellable=False)
+
+    def clear_filter(self):
+        """Shows every row again."""
+        if self.filtered and not self.job_running():
+            self.populate_listbox(self.app.data)
+            self.set_infobox_msg("Showing all " + str(self.listbox.size()) + " rows.")
+
+    def filtering(self):
+        """Alerts the user and returns True while the listbox is filtered, its rows aren't data positions."""
+        if not self.filtered:
+            return False
+        csvdialog.CSVAlertDialog("Philip Deck - Alert", "Clear the filter to edit rows.").show_alert()
+        return True
+
     def set_infobox_msg(self, info):
         """Set the text in the bottom right corner entry box."""
         self.infobox.configure(state=NORMAL)
@@ -65,12 +193,28 @@ class Window(Tk):
         
         filemenu.add_command(label="New List", command=self.new_list)
         filemenu.add_command(label="Import MySQL Database", command=self.import_db)
+        filemenu.add_command(label="Import MySQL Database (Filtered)", command=lambda: self.import_db(filtered=True))
         filemenu.add_command(label="Import CSV File", command=self.import_csv)
+        filemenu.add_command(label="Open Large CSV File (Read-Only)", command=lambda: self.import_csv(lazy=True))
+        
+        self.recentmenu = Menu(filemenu, tearoff=0)
+        filemenu.add_cascade(label="Recent Imports", menu=self.recentmenu)
+        self.build_recent_menu()
         
         filemenu.add_separator()
         
         filemenu.add_command(label="Export MySQLDatabase", command=self.export_db)
         filemenu.add_command(label="Export CSV", command=self.export_csv)
+        filemenu.add_command(label="Sync Changes to MySQL Database", command=self.sync_db)
+        
+        filemenu.add_separator()
+        
+        filemenu.add_command(label="Copy CSV File to MySQL", command=self.copy_csv_to_db)
+        filemenu.add_command(label="Copy MySQL Table to CSV", command=self.copy_db_to_csv)
+        filemenu.add_command(label="Copy Several CSV Files to MySQL", command=self.copy_files_to_db)
+        filemenu.add_command(label="Copy Several MySQL Tables to CSV", command=self.copy_tables_to_files)
+        filemenu.add_command(label="Cancel Running Job", command=self.cancel_job, state=DISABLED)
+        self.filemenu = filemenu
         
         filemenu.add_separator()
 
@@ -83,6 +227,22 @@ class Window(Tk):
         editmenu.add_command(label="Delete Current Row", command=self.delete_row)
         editmenu.add_command(label="Update Current Row", command=self.edit_row)
         
+        editmenu.add_separator()
+        
+        self.columnar = BooleanVar(self, value=self.app.columnar)
+        editmenu.add_checkbutton(label="Compact Columnar Storage", variable=self.columnar,
+                                 command=lambda: setattr(self.app, "columnar", self.columnar.get()))
+        self.parallel = BooleanVar(self, value=self.app.parallel > 1)
+        editmenu.add_checkbutton(label="Parallel Database Export (4 Connections)", variable=self.parallel,
+                                 command=lambda: setattr(self.app, "parallel", 4 if self.parallel.get() else 1))
+        self.resumable = BooleanVar(self, value=bool(self.app.checkpoint))
+        editmenu.add_checkbutton(label="Resumable Database Export", variable=self.resumable,
+                                 command=lambda: setattr(self.app, "checkpoint",
+                                                         checkpoint.CHECKPOINT_FILE if self.resumable.get() else None))
+        self.snapshots = BooleanVar(self, value=self.app.snapshots)
+        editmenu.add_checkbutton(label="Snapshot Imports for Faster Reopening", variable=self.snapshots,
+                                 command=lambda: setattr(self.app, "snapshots", self.snapshots.get()))
+
         menubar.add_cascade(label="File", menu=filemenu)
         menubar.add_cascade(label="Edit", menu=editmenu)
         
@@ -94,94 +254,335 @@ class Window(Tk):
         
     def new_list(self):
         """Creates a new list. Empties the listbox."""
+        if self.job_running():
+            return
         self.app.clear_data()
         self.populate_listbox(self.app.data)
         self.set_infobox_msg("New list created.")
         
-    def import_csv(self):
-        """Loads a CSV file to the listbox."""
-        path = askopenfilename(title="Philip Deck - Open", filetypes=[('CSV files', '*.csv')])
+    def import_csv(self, lazy=False):
+        """Loads a CSV file to the listbox.
+        
+        A lazy import only indexes the file and shows its rows read-only."""
+        if self.job_running():
+            return
+        path = filedialog().askopenfilename(title="Philip Deck - Open", filetypes=FILE_TYPES)
         # #ADD ERROR CHECKING
         if path is not None and path != "":
-            self.app.set_file(path)
-            self.app.load_data_from_file()
-            self.populate_listbox(self.app.data)
-            self.set_infobox_msg("Imported " + str(self.listbox.size()) + " rows from " + path)
+            def task(progress):
+                self.app.set_file(path)
+                if lazy:
+                    self.app.load_data_from_file(lazy, progress)
+                else:
+                    self.app.import_recent(self.recent, "file", progress)
 
-    def import_db(self):
-        """Loads data from a database to the listbox."""
-        inputs = csvdialog.CSVInputDialog("Philip Deck - Db Import", "Host:", "User:", "Pass:", "Schema:", "Table:")  # Ask the user for credentials
-        inputs.default_values(["localhost", "phil", "1473", "cst8333", "PythonDataset"])  # My defaults
-        results = inputs.get_inputs()  # Wait for the results
+            self.run_job("Importing " + path, task, lambda result: self.imported(path), cancellable=not lazy)
+
+    def imported(self, name):
+        """Shows freshly imported data and the updated recent imports."""
+        self.populate_listbox(self.app.data)
+        self.set_infobox_msg("Imported " + str(self.listbox.size()) + " rows from " + name)
+        self.build_recent_menu()
+
+    def build_recent_menu(self):
+        """Lists the recent imports in the File menu, most recent first."""
+        self.recentmenu.delete(0, END)
+        for entry in self.recent.entries:
+            self.recentmenu.add_command(label=jsonloader.label(entry),
+                                        command=lambda entry=entry: self.open_recent(entry))
+        if not self.recent.entries:
+            self.recentmenu.add_command(label="No Recent Imports", state=DISABLED)
+
+    def open_recent(self, entry):
+        """Imports a recent file or table again, from its snapshot while it hasn't changed."""
+        if self.job_running():
+            return
+        source = entry["source"]
+        if source["type"] == "file":
+            name = source["file_name"]
+            self.app.set_file(name)
+        else:
+            name = source["db_name"] + "." + source["table_name"]
+            inputs = csvdialog.CSVInputDialog("Philip Deck - Db Import", "Pass:")  # The password is never saved
+            results = inputs.get_inputs()
+            if not results:
+                return
+            self.app.create_connection(source["db_host"], source["db_user"], results[0],
+                                       source["db_name"], source["table_name"])
+            if not self.app.test_connection():
+                csvdialog.CSVAlertDialog("Philip Deck - Error", "Table not found.").show_alert()
+                return
+        self.run_job("Importing " + name,
+                     lambda progress: self.app.import_recent(self.recent, source["type"], progress),
+                     lambda result: self.imported(name))
+
+    def import_db(self, filtered=False):
+        """Loads data from a database to the listbox.
+        
+        A filtered import asks which columns and rows to load and lets the
+        database do the filtering."""
+        if self.job_running():
+            return
+        results = self.ask_db_inputs("Philip Deck - Db Import")  # Ask the user for credentials
         
         # Philip Deck
-        if len(results) == 5:
+        if results:
             self.app.create_connection(results[0], results[1], results[2],
                                        results[3], results[4])  # Connect to a database with all parameters the user specified
             
             if self.app.test_connection():
-                self.set_infobox_msg("Loading data.")
-                
-                qu = queue.Queue()  # Queue to signal the end of the database loading
+                query = self.ask_query_inputs() if filtered else None
+                if query is None and filtered:
+                    return
 
-                def db_proccess(q):
-                    self.app.load_data_from_db()  # Load data from database
-                    q.put(True)  # Signal end of db load
-                    
-                def update_listbox():
-                    try:
-                        qu.get(block=False)  # Try to see if the database is done loading
-                        self.populate_listbox(self.app.data)  # Update the listbox
-                        self.set_infobox_msg("Imported " + str(self.listbox.size()) + " rows from " 
-                                             + self.app.db_helper.db_name + "." + self.app.db_helper.table_name)  # Give the user some info
-                        
-                        csvdialog.CSVAlertDialog("Philip Deck - Alert", "Editing rows in this file does not modify the database!" 
-                                             + "\nExport to database to commit changes.").show_alert()  # Some info about the program
-                    except queue.Empty:
-                        self.set_infobox_msg(self.infobox.get() + ".")  # Add an extra dot
-                        self.after(100, update_listbox)  # Recall the method until it updates
+                def task(progress):
+                    if filtered:
+                        self.app.load_data_from_db(progress=progress, **query)
+                    else:
+                        self.app.import_recent(self.recent, "table", progress)  # Load data from database or its snapshot
+
+                def done(result):
+                    self.imported(self.app.db_helper.db_name + "." + self.app.db_helper.table_name)  # Update the listbox and give the user some info
                     
-                db_thread = threading.Thread(target=lambda: db_proccess(qu))  # Creating a thread object
-                db_thread.start()  # Start the database loading thread
-                update_listbox()  # Start the GUI update polling
+                    csvdialog.CSVAlertDialog("Philip Deck - Alert", "Editing rows in this file does not modify the database!" 
+                                         + "\nExport or sync to database to commit changes.").show_alert()  # Some info about the program
+
+                self.run_job("Loading data", task, done)
                 
             else:  # If the connection failed
                 csvdialog.CSVAlertDialog("Philip Deck - Error", "Table not found.").show_alert()
             
     def export_csv(self):
         """Saves the data to a new CSV file."""
-        path = asksaveasfilename(defaultextension=".csv", filetypes=[('CSV files', '*.csv')])
+        if self.job_running():
+            return
+        path = filedialog().asksaveasfilename(defaultextension=".csv", filetypes=FILE_TYPES)
         
         # #ADD ERROR CHECKING
         if path is not None and path != "":
-            self.app.save_file(path)
-            self.set_infobox_msg("Saved to " + path)
+            self.run_job("Saving to " + path,
+                         lambda progress: self.app.save_file(path, progress),
+                         lambda result: self.set_infobox_msg("Saved to " + path))
     
     def export_db(self):
         """Exports data to a MySQL database."""
-        inputs = csvdialog.CSVInputDialog("Philip Deck - Db Export", "Host:", "User:", "Pass:", "Schema:", "Table:")
-        inputs.default_values(["localhost", "phil", "1473", "cst8333", "PythonDataset"])
-        results = inputs.get_inputs()
+        if self.job_running():
+            return
+        results = self.ask_db_inputs("Philip Deck - Db Export")
         
         # #ADD ERROR CHECKING
-        if len(results) == 5:
+        if results:
             self.app.create_connection(results[0], results[1], results[2], results[3], results[4])
             
-            delete_table = askyesno("New Table?", "Create new table?")
-            if delete_table:
-                self.app.create_table()
-            
-            self.app.insert_records_into_table()
-            self.set_infobox_msg("Inserted " + str(self.listbox.size()) + " rows into " + results[3] + "." + results[4])
+            resuming = self.app.resuming()
+            delete_table = not resuming and messagebox().askyesno("New Table?", "Create new table?")
+
+            def task(progress):
+                if delete_table:
+                    self.app.create_table()
+                return self.app.insert_records_into_table(progress)
+
+            def done(result):
+                if isinstance(result, dict):  # The report of a parallel export
+                    self.set_infobox_msg("Inserted " + str(result["inserted"]) + " of " + str(result["sent"]) + " rows into "
+                                         + results[3] + "." + results[4] + " with " + str(result["retries"]) + " retries"
+                                         + ("" if result["consistent"] else ", row count doesn't match!"))
+                    if result["failed"]:
+                        csvdialog.CSVAlertDialog("Philip Deck - Error", str(len(result["failed"]))
+                                                 + " partitions failed to insert.").show_alert()
+                    if result["in_doubt"]:
+                        csvdialog.CSVAlertDialog("Philip Deck - Error", str(len(result["in_doubt"]))
+                                                 + " partitions may not have been committed.").show_alert()
+                else:
+                    self.set_infobox_msg("Inserted " + str(result) + " rows into "
+                                         + results[3] + "." + results[4])
+
+            self.run_job("Exporting to " + results[3] + "." + results[4], task, done)
             
+    def sync_db(self):
+        """Writes only the rows edited since the database import back to its table."""
+        if self.job_running():
+            return
+        if self.app.sync_target is None:
+            csvdialog.CSVAlertDialog("Philip Deck - Alert", "Import a MySQL table before syncing changes.").show_alert()
+            return
+        target = self.app.sync_target.db_name + "." + self.app.sync_target.table_name
+        self.run_job("Syncing " + str(len(self.app.changes)) + " changes to " + target,
+                     lambda progress: self.app.sync_to_database(progress),
+                     lambda affected: self.set_infobox_msg("Synced " + str(affected) + " rows to " + target))
+
+    def ask_db_inputs(self, title):
+        """Asks the user for database credentials, returns all 5 or an empty list."""
+        inputs = csvdialog.CSVInputDialog(title, "Host:", "User:", "Pass:", "Schema:", "Table:")
+        inputs.default_values(["localhost", "phil", "1473", "cst8333", "PythonDataset"])  # My defaults
+        results = inputs.get_inputs()  # Wait for the results
+        return results if len(results) == 5 else list()
+
+    def ask_query_inputs(self):
+        """Asks which columns and rows to import, returns the query or None when cancelled.
+        
+        Every input is optional, the filter is one column, operator and value."""
+        inputs = csvdialog.CSVInputDialog("Philip Deck - Db Filter", "Columns (comma separated):", "Where column:",
+                                          "Operator (" + ", ".join(datasource.FILTER_OPERATORS) + "):", "Value:",
+                                          "Order by:", "Limit:")
+        results = inputs.get_inputs()
+        if len(results) != 6:
+            return None
+        columns, column, op, value, order_by, limit = [result.strip() for result in results]
+        query = dict()
+        if columns:
+            query["columns"] = [name.strip() for name in columns.split(",") if name.strip()]
+        if column:
+            if op == "in":
+                value = [item.strip() for item in value.split(",")]
+            query["filters"] = [(column, op or "=", value)]
+        if order_by:
+            query["order_by"] = [order_by]
+        if limit.isdigit():
+            query["limit"] = int(limit)
+        return query
+
+    def copy_csv_to_db(self):
+        """Streams a CSV file into a database table without loading it into the listbox."""
+        if self.job_running():
+            return
+        path = filedialog().askopenfilename(title="Philip Deck - Open", filetypes=FILE_TYPES)
+        if path is not None and path != "":
+            results = self.ask_db_inputs("Philip Deck - Db Export")
+            if results:
+                self.app.create_connection(results[0], results[1], results[2], results[3], results[4])
+                create_table = messagebox().askyesno("New Table?", "Create new table?")
+                self.run_job("Copying " + path,
+                             lambda progress: self.app.transfer_file_to_table(path, create_table, progress),
+                             lambda count: self.set_infobox_msg("Copied " + str(count) + " rows from " + path
+                                                                + " into " + results[3] + "." + results[4]))
+
+    def copy_db_to_csv(self):
+        """Streams a database table into a CSV file without loading it into the listbox."""
+        if self.job_running():
+            return
+        results = self.ask_db_inputs("Philip Deck - Db Import")
+        if results:
+            self.app.create_connection(results[0], results[1], results[2], results[3], results[4])
+            if not self.app.test_connection():
+                csvdialog.CSVAlertDialog("Philip Deck - Error", "Table not found.").show_alert()
+                return
+            path = filedialog().asksaveasfilename(defaultextension=".csv", filetypes=FILE_TYPES)
+            if path is not None and path != "":
+                self.run_job("Copying " + results[3] + "." + results[4],
+                             lambda progress: self.app.transfer_table_to_file(path, progress),
+                             lambda count: self.set_infobox_msg("Copied " + str(count) + " rows from " + results[3]
+                                                                + "." + results[4] + " into " + path))
+
+    def copy_files_to_db(self):
+        """Streams several CSV files into tables named after them, a few at a time."""
+        if self.job_running():
+            return
+        paths = filedialog().askopenfilenames(title="Philip Deck - Open", filetypes=FILE_TYPES)
+        if paths:
+            results = self.ask_db_inputs("Philip Deck - Db Export")
+            if results:
+                self.app.create_connection(results[0], results[1], results[2], results[3], results[4])
+                create_table = messagebox().askyesno("New Tables?", "Create a new table for every file?")
+                self.run_job("Copying " + str(len(paths)) + " files",
+                             lambda progress: self.app.export_files(list(paths), create_table, progress=progress),
+                             self.copied)
+
+    def copy_tables_to_files(self):
+        """Streams several tables into CSV files named after them, a few at a time.
+
+        The table input takes the table names separated by commas."""
+        if self.job_running():
+            return
+        results = self.ask_db_inputs("Philip Deck - Db Import")
+        if results:
+            tables = [name.strip() for name in results[4].split(",") if name.strip()]
+            self.app.create_connection(results[0], results[1], results[2], results[3], tables[0] if tables else "")
+            folder = filedialog().askdirectory(title="Philip Deck - Save To")
+            if tables and folder:
+                self.run_job("Copying " + str(len(tables)) + " tables",
+                             lambda progress: self.app.import_tables(tables, folder, progress=progress),
+                             self.copied)
+
+    def copied(self, results):
+        """Tells the user how every copy of a batch went."""
+        failed = [str(key) + ": " + str(result) for key, result in results.items() if isinstance(result, Exception)]
+        copied = sum(result for result in results.values() if not isinstance(result, Exception))
+        self.set_infobox_msg("Copied " + str(copied) + " rows in " + str(len(results) - len(failed)) + " of "
+                             + str(len(results)) + " copies.")
+        if failed:
+            csvdialog.CSVAlertDialog("Philip Deck - Error", "\n".join(failed)).show_alert()
+
+    def run_job(self, name, task, on_done, cancellable=True):
+        """Runs task(progress) in the background and on_done(result) on the Tk loop once it finishes.
+        
+        Only one job runs at a time since every job works on the same data.
+        Every action checks job_running before it asks for anything or
+        changes the loader's file or connection, a running job still uses
+        them. A job that isn't cancellable never calls progress."""
+        if self.job_running():
+            return
+        self.job = BackgroundJob(name, task, on_done, cancellable)
+        self.filemenu.entryconfigure("Cancel Running Job", state=NORMAL if cancellable else DISABLED)
+        self.set_infobox_msg(name + "...")
+        self.job.start()
+        self.poll_job()
+
+    def poll_job(self):
+        """Handles the events sent by the running job until it ends."""
+        job = self.job
+        try:
+            while True:
+                event, value = job.events.get(block=False)
+                if event == "progress":
+                    self.set_infobox_msg(job.name + "... " + str(value) + " rows")
+                    continue
+
+                self.job = None
+                self.filemenu.entryconfigure("Cancel Running Job", state=DISABLED)
+                if event == "done":
+                    job.on_done(value)
+                elif event == "cancelled":
+                    self.set_infobox_msg(job.name + " cancelled.")
+                else:
+                    self.set_infobox_msg(job.name + " failed.")
+                    csvdialog.CSVAlertDialog("Philip Deck - Error", str(value)).show_alert()
+                return
+        except queue.Empty:
+            self.after(100, self.poll_job)  # Check again later
+
+    def cancel_job(self):
+        """Asks the running job to stop at its next progress report."""
+        if self.job is not None and self.job.cancellable:
+            self.job.cancel()
+            self.set_infobox_msg("Cancelling " + self.job.name + "...")
+
+    def read_only(self):
+        """Alerts the user and returns True when the data can't be edited."""
+        if self.app.is_editable():
+            return False
+        csvdialog.CSVAlertDialog("Philip Deck - Alert", "This file is opened read-only!"
+                                 + "\nImport it to edit rows.").show_alert()
+        return True
+
+    def job_running(self):
+        """Alerts the user and returns True when a job is already running."""
+        if self.job is None:
+            return False
+        csvdialog.CSVAlertDialog("Philip Deck - Alert", "Wait for " + self.job.name
+                                 + " to finish or cancel it.").show_alert()
+        return True
+
     def populate_listbox(self, data):
-        """Populates the listbox with data from the loader."""
-        self.listbox.delete(0, END)
-        for line in data:
-            self.listbox.insert(END, line)
+        """Populates the listbox with data from the loader. Only visible rows are rendered."""
+        self.listbox.set_data(data)
+        self.filtered = False
+        self.update_filter_columns()
             
     def insert_row(self):
         """Inserts a row in the listbox and CSV data list at index n."""
+        if self.job_running() or self.read_only() or self.filtering():
+            return
         if not self.listbox.curselection():  # If no row is selected
             alert = csvdialog.CSVAlertDialog("Philip Deck - Alert", "You must select a row!")  # Display alert dialog
             alert.show_alert()
@@ -192,23 +593,28 @@ class Window(Tk):
             inputs.add_input(line)
         results = inputs.get_inputs()
         if results:
-            self.listbox.insert(n, results)
             self.app.insert_row(n, results)
+            self.listbox.refresh()
             self.set_infobox_msg("Inserted " + str(results))  # Set the infobox message
             
     def delete_row(self):
         """Deletes a row in the listbox and CSV data list at index n."""
+        if self.job_running() or self.read_only() or self.filtering():
+            return
         if not self.listbox.curselection():  # If no row is selected
             alert = csvdialog.CSVAlertDialog("Philip Deck - Alert", "You must select a row!")  # Display alert dialog
             alert.show_alert()
             return
         n = self.listbox.curselection()[0]  # Select the current row
         del_row = self.app.data[n]
-        self.listbox.delete(n)  # Delete the row from the gui
         self.app.delete_row(n)  # Delete the row from the data
+        self.listbox.refresh()  # Redraw the gui
         self.set_infobox_msg("Deleted " + str(del_row))  # Set the infobox message
         
     def edit_row(self):
+        """Replaces the row at index n with the user's inputs."""
+        if self.job_running() or self.read_only() or self.filtering():
+            return
         if not self.listbox.curselection():  # If no row is selected
             alert = csvdialog.CSVAlertDialog("Alert", "You must select a row!")  # Display alert dialog
             alert.show_alert()
@@ -220,10 +626,8 @@ class Window(Tk):
         inputs.default_values(self.app.data[n])  # Adds default values to the dialog
         results = inputs.get_inputs()  # Get inputs from the user
         if results:
-            self.listbox.delete(n)  # Delete the old row from the gui
-            self.app.delete_row(n)  # Delete the old row from the data
-            self.listbox.insert(n, results)  # Insert the updated row to the gui
-            self.app.insert_row(n, results)  # Insert the row to the data
+            self.app.update_row(n, results)  # Replace the row in the data
+            self.listbox.refresh()  # Redraw the gui
             self.set_infobox_msg("Updated " + str(inputs))  # Set the infobox message
         
     def open_about(self):
@@ -237,6 +641,13 @@ class Window(Tk):
         root.grab_set()
         root.mainloop()
 
+    def destroy(self):
+        """Closes the database connections along with the window."""
+        if self.job is not None:
+            self.job.cancel()
+        self.app.close_connections()
+        super().destroy()
+
     def get_uptime(self):
         """Returns the up time of the window."""
         endtime = time.time()  # Get the uptime